@@ -0,0 +1,90 @@
+"""
+Latency benchmark for map-reduce community summarization against the fake LLM
+backend. Communities of growing size (a star of vertices with a synthetic
+description each) are summarized with CommunitySummarizer. The previous
+single prompt approach is not run, only the size of its prompt is reported:
+it grows linearly and soon exceeds a typical context window, while the number
+of reduce levels, and with it latency, grows logarithmically.
+
+Usage: python benchmarks/bench_community_summarization.py [latency_mean_seconds] [max_batch_tokens]
+"""
+
+import asyncio
+import random
+import sys
+
+import igraph as ig
+
+from docudialogue.graphs.community import Community
+from docudialogue.graphs.community_summarizer import CommunitySummarizer
+from docudialogue.graphs.graph_utils import CommunityNeighbourConnections
+from docudialogue.llm_wrappers.fake_model import FakeLLMModel
+from docudialogue.llm_wrappers.prompts import SUMMARIZE_GRAPH_PROMPT
+
+COMMUNITY_SIZES = (10, 100, 1_000, 10_000, 50_000)
+CONTEXT_WINDOW_TOKENS = 128_000
+
+
+def make_community(num_vertices: int) -> Community:
+    rng = random.Random(num_vertices)
+    words = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=7)) for _ in range(3000)]
+    graph = ig.Graph.Star(num_vertices)
+    graph.vs["name"] = [f"node {vertex_id}" for vertex_id in range(num_vertices)]
+    for sequence in (graph.vs, graph.es):
+        sequence["desc"] = [
+            " ".join(rng.choices(words, k=rng.randint(10, 30))).capitalize() + "."
+            for _ in range(len(sequence))
+        ]
+    graph.vs["descriptions"] = [[desc] for desc in graph.vs["desc"]]
+    graph.es["descriptions"] = [[desc] for desc in graph.es["desc"]]
+    return Community(
+        0,
+        graph,
+        graph,
+        CommunityNeighbourConnections(0),
+        member_ids=list(range(num_vertices)),
+    )
+
+
+def single_prompt_tokens(community: Community) -> int:
+    descriptions = {
+        "vertex_descriptions": community.graph.vs["desc"],
+        "edge_descriptions": community.graph.es["desc"],
+    }
+    return CommunitySummarizer.estimate_tokens(
+        SUMMARIZE_GRAPH_PROMPT.format(descriptions=descriptions)
+    )
+
+
+def main(latency_mean: float, max_batch_tokens: int):
+    print(
+        f"{'vertices':>9} {'items':>7} {'single prompt tokens':>21} {'levels':>7} "
+        f"{'requests':>9} {'seconds':>8}"
+    )
+    for num_vertices in COMMUNITY_SIZES:
+        community = make_community(num_vertices)
+        summarizer = CommunitySummarizer(
+            FakeLLMModel(
+                latency_distribution="lognormal",
+                latency_mean=latency_mean,
+                latency_std=latency_mean / 2,
+            ),
+            max_concurrent=64,
+            max_batch_tokens=max_batch_tokens,
+        )
+        summary = asyncio.run(community.summarize_community(summarizer))
+        assert summary
+        stats = summarizer.stats
+        num_tokens = single_prompt_tokens(community)
+        overflow = " (over context window)" if num_tokens > CONTEXT_WINDOW_TOKENS else ""
+        print(
+            f"{num_vertices:>9} {stats['items']:>7} {num_tokens:>21}{overflow} {stats['levels']:>7} "
+            f"{stats['requests']:>9} {stats['seconds']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 0.5,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4000,
+    )
@@ -0,0 +1,93 @@
+"""
+Benchmark for description compaction on synthetic triplets whose
+descriptions repeat one to three facts per entity in slightly different phrasings,
+as an extractor does over many chunks. The graph is built with and without
+DescriptionCompactor and compared on description counts, lists that would
+need an LLM summary, summarization requests against the fake LLM backend
+and pickled graph size.
+
+Usage: python benchmarks/bench_description_compaction.py [num_triplets]
+"""
+
+import asyncio
+import pickle
+import random
+import sys
+import time
+
+from docudialogue.graphs.description_compaction import DescriptionCompactor
+from docudialogue.graphs.description_summarizer import DescriptionSummarizer
+from docudialogue.graphs.graph_builder import build_graph_from_triplets
+from docudialogue.llm_wrappers.fake_model import FakeLLMModel
+from docudialogue.triplet_extraction.classes import Entity, Relationship, Triplet
+
+FACT_TEMPLATES = (
+    "{name} is a {role} at {place}",
+    "{name} was founded in {year} in {place}",
+    "{name} is known for {topic}",
+)
+# Extractor noise: case, punctuation and a single inserted word
+PHRASING_VARIANTS = (
+    lambda text: text,
+    lambda text: text + ".",
+    lambda text: text.lower() + ";",
+    lambda text: text.replace(" is ", " is also ", 1) + ".",
+    lambda text: text.replace(" in ", " in the city of ", 1),
+)
+
+
+def generate_triplets(num_triplets: int, seed: int = 0) -> list[Triplet]:
+    rng = random.Random(seed)
+    types = ["PERSON", "ORGANIZATION", "GEO", "EVENT"]
+    num_entities = max(10, num_triplets // 8)
+    facts = []
+    for entity_id in range(num_entities):
+        values = {
+            "name": f"Entity {entity_id}",
+            "role": rng.choice(["researcher", "manager", "supplier", "partner"]),
+            "place": rng.choice(["Paris", "Berlin", "Lisbon", "Oslo", "Vienna"]),
+            "year": rng.randint(1900, 2020),
+            "topic": rng.choice(["batteries", "logistics", "software", "mining"]),
+        }
+        # Some entities are described by a single fact in several phrasings
+        templates = rng.sample(FACT_TEMPLATES, rng.randint(1, len(FACT_TEMPLATES)))
+        facts.append([template.format(**values) for template in templates])
+
+    def entity(entity_id: int) -> Entity:
+        description = rng.choice(PHRASING_VARIANTS)(rng.choice(facts[entity_id]))
+        return Entity(f"ENTITY {entity_id}", types[entity_id % len(types)], description)
+
+    triplets = []
+    for _ in range(num_triplets):
+        subject_id, object_id = rng.randrange(num_entities), rng.randrange(num_entities)
+        relationship = Relationship(
+            rng.choice(PHRASING_VARIANTS)(f"Entity {subject_id} works with Entity {object_id}"),
+            rng.randint(1, 10),
+        )
+        triplets.append(Triplet(entity(subject_id), relationship, entity(object_id)))
+    return triplets
+
+
+def main(num_triplets: int):
+    triplets = generate_triplets(num_triplets)
+    print(
+        f"{'':>12} {'descriptions':>13} {'to summarize':>13} {'requests':>9} "
+        f"{'pickle MB':>10} {'build s':>8}"
+    )
+    for label, compactor in (("plain", None), ("compacted", DescriptionCompactor())):
+        start = time.perf_counter()
+        graph = build_graph_from_triplets(triplets, compactor)
+        elapsed = time.perf_counter() - start
+        lists = graph.vs["descriptions"] + graph.es["descriptions"]
+        pickle_size = len(pickle.dumps(graph)) / 2**20
+        summarizer = DescriptionSummarizer(FakeLLMModel(latency_mean=0.0), batch_size=1)
+        asyncio.run(summarizer.summarize_graph(graph))
+        print(
+            f"{label:>12} {sum(len(descriptions) for descriptions in lists):>13} "
+            f"{sum(len(descriptions) > 1 for descriptions in lists):>13} "
+            f"{summarizer.stats['requests']:>9} {pickle_size:>10.2f} {elapsed:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,149 @@
+"""
+Throughput benchmark for graph description summarization against the fake LLM
+backend. Description lists are synthetic: most vertices and edges have a
+single description, some share the same description set and the rest have
+several descriptions that need a summary.
+The previous approach (one request per list, awaited one after another) is
+timed on a sample and extrapolated, then DescriptionSummarizer runs the whole
+graph without and with batching.
+Finally the graph is summarized twice with a summary cache, the second time
+after changing a few description lists, to show that only changed items are
+sent again.
+
+Usage: python benchmarks/bench_description_summarization.py [num_vertices] [latency_mean_seconds]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import igraph as ig
+
+from docudialogue.graphs.description_summarizer import DescriptionSummarizer
+from docudialogue.graphs.graph_utils import summarize_descriptions
+from docudialogue.graphs.summary_cache import SummaryCache
+from docudialogue.llm_wrappers.fake_model import FakeLLMModel
+from docudialogue.llm_wrappers.prompts import SUMMARIZE_DESCRIPTIONS_PROMPT
+
+SERIAL_SAMPLE_SIZE = 100
+# Share of items whose descriptions change between the incremental runs
+CHANGED_SHARE = 0.02
+
+
+def make_graph(num_vertices: int) -> ig.Graph:
+    rng = random.Random(0)
+    words = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=7)) for _ in range(3000)]
+
+    def description_list() -> list[str]:
+        num_descriptions = 1 if rng.random() < 0.6 else rng.randint(2, 6)
+        return [
+            " ".join(rng.choices(words, k=rng.randint(8, 25))).capitalize() + "."
+            for _ in range(num_descriptions)
+        ]
+
+    graph = ig.Graph.Barabasi(num_vertices, 2)
+    lists = []
+    for _ in range(graph.vcount() + graph.ecount()):
+        # Some items repeat a description set seen before, e.g. the same
+        # relationship extracted from several documents
+        if lists and rng.random() < 0.1:
+            lists.append(list(rng.choice(lists)))
+        else:
+            lists.append(description_list())
+    graph.vs["descriptions"] = lists[: graph.vcount()]
+    graph.es["descriptions"] = lists[graph.vcount() :]
+    return graph
+
+
+def fake_model(latency_mean: float) -> FakeLLMModel:
+    return FakeLLMModel(
+        latency_distribution="lognormal",
+        latency_mean=latency_mean,
+        latency_std=latency_mean / 2,
+    )
+
+
+async def serial_baseline(graph: ig.Graph, latency_mean: float) -> tuple[float, int]:
+    """Seconds per list needing a summary, measured on a sample, and the number of such lists."""
+    model = fake_model(latency_mean)
+    lists = graph.vs["descriptions"] + graph.es["descriptions"]
+    to_summarize = [descriptions for descriptions in lists if len(descriptions) > 1]
+    start = time.perf_counter()
+    for descriptions in to_summarize[:SERIAL_SAMPLE_SIZE]:
+        await summarize_descriptions(descriptions, SUMMARIZE_DESCRIPTIONS_PROMPT, model)
+    per_list = (time.perf_counter() - start) / min(SERIAL_SAMPLE_SIZE, len(to_summarize))
+    return per_list, len(to_summarize)
+
+
+async def run(
+    graph: ig.Graph,
+    latency_mean: float,
+    batch_size: int,
+    summary_cache: SummaryCache | None = None,
+) -> DescriptionSummarizer:
+    summarizer = DescriptionSummarizer(
+        fake_model(latency_mean),
+        max_concurrent=32,
+        batch_size=batch_size,
+        summary_cache=summary_cache,
+    )
+    await summarizer.summarize_graph(graph)
+    return summarizer
+
+
+def change_descriptions(graph: ig.Graph, share: float) -> int:
+    """Adds a description to a share of the vertices, returns how many were changed."""
+    rng = random.Random(1)
+    changed = rng.sample(range(graph.vcount()), int(graph.vcount() * share))
+    for vertex_id in changed:
+        graph.vs[vertex_id]["descriptions"] = graph.vs[vertex_id]["descriptions"] + [
+            f"New description {vertex_id}."
+        ]
+    return len(changed)
+
+
+def print_stats(label: str, stats: dict, num_items: int):
+    print(
+        f"{label:>20}: {stats['requests']} requests, "
+        f"{stats['seconds']:8.1f}s for {num_items} items "
+        f"({stats['single']} single, {stats['duplicates']} duplicates, {stats['cached']} cached, "
+        f"{stats['summarized']} summarized, {stats['summarized'] / stats['seconds']:.0f} sets/s)"
+    )
+
+
+def main(num_vertices: int, latency_mean: float):
+    graph = make_graph(num_vertices)
+    num_items = graph.vcount() + graph.ecount()
+
+    per_list, num_to_summarize = asyncio.run(serial_baseline(graph, latency_mean))
+    print(
+        f"{'serial (estimated)':>20}: {num_to_summarize} requests, "
+        f"{per_list * num_to_summarize:8.1f}s for {num_items} items"
+    )
+    for batch_size in (1, 8):
+        summarizer = asyncio.run(run(graph, latency_mean, batch_size))
+        print_stats(f"batch_size={batch_size}", summarizer.stats, num_items)
+    assert all(graph.vs["desc"]) and all(graph.es["desc"])
+
+    with tempfile.TemporaryDirectory() as folder_path:
+        summary_cache = SummaryCache(os.path.join(folder_path, "summary_cache.sqlite"))
+        summarizer = asyncio.run(run(graph, latency_mean, 8, summary_cache))
+        print_stats("cache, first run", summarizer.stats, num_items)
+        summarizer = asyncio.run(run(graph, latency_mean, 8, summary_cache))
+        print_stats("cache, unchanged", summarizer.stats, num_items)
+        assert summarizer.stats["requests"] == 0
+        num_changed = change_descriptions(graph, CHANGED_SHARE)
+        summarizer = asyncio.run(run(graph, latency_mean, 8, summary_cache))
+        print_stats(f"cache, {num_changed} changed", summarizer.stats, num_items)
+        assert summarizer.stats["summarized"] <= num_changed
+        summary_cache.close()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.2,
+    )
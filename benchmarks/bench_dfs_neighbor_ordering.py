@@ -0,0 +1,114 @@
+"""
+Compares neighbor ordering strategies of modified_dfs, with and without pruning.
+For every combination it reports how many searches found a path within the
+budget, the total number of expanded nodes and the wall time, on synthetic
+graphs and on Leiden communities.
+Communities come from a triplet checkpoint (e.g. .cache/run2/triplets.jsonl)
+if one is given, otherwise from a synthetic scale-free graph.
+
+Usage: python benchmarks/bench_dfs_neighbor_ordering.py [triplets.jsonl] [max_expansions]
+"""
+
+import contextlib
+import io
+import random
+import sys
+import time
+
+import igraph as ig
+import leidenalg
+
+from docudialogue.graphs.graph_builder import build_graph_from_triplets
+from docudialogue.graphs.graph_utils import (
+    NEIGHBOR_ORDERINGS,
+    LocalBorderNodes,
+    SearchBudget,
+    modified_dfs,
+)
+from docudialogue.triplet_extraction.checkpoint import TripletCheckpoint
+
+
+def synthetic_graphs() -> dict[str, list[ig.Graph]]:
+    random.seed(0)
+    return {
+        # Trees with a few extra edges, like most communities of document graphs
+        "tree_like": [tree_like(n, extra) for n in (20, 40, 80) for extra in (0, 2, 4)],
+        "grid": [ig.Graph.Lattice([side, side], circular=False) for side in (4, 6, 8, 10)],
+        "erdos_renyi": [ig.Graph.Erdos_Renyi(n, m=2 * n) for n in (20, 40, 80) for _ in range(3)],
+        "barabasi": [ig.Graph.Barabasi(n, 2) for n in (20, 40, 80) for _ in range(3)],
+        "watts_strogatz": [ig.Graph.Watts_Strogatz(1, n, 2, 0.1) for n in (20, 40, 80) for _ in range(3)],
+    }
+
+
+def tree_like(num_nodes: int, num_extra_edges: int) -> ig.Graph:
+    graph = ig.Graph.Tree_Game(num_nodes)
+    for _ in range(num_extra_edges):
+        graph.add_edge(random.randrange(num_nodes), random.randrange(num_nodes))
+    graph.simplify()
+    return graph
+
+
+def community_graphs(graph: ig.Graph) -> list[ig.Graph]:
+    partition = leidenalg.find_partition(graph, leidenalg.ModularityVertexPartition, seed=0)
+    return [subgraph for subgraph in partition.subgraphs() if subgraph.vcount() > 2]
+
+
+def make_queries(graph: ig.Graph, rng: random.Random):
+    """Entry node, one mid border and a last border, like a community with two neighbours."""
+    nodes = list(range(graph.vcount()))
+    rng.shuffle(nodes)
+    entry, mid, last = nodes[0], nodes[1 : 1 + max(1, len(nodes) // 10)], nodes[-2:]
+    return [
+        (entry, [], LocalBorderNodes([])),
+        (entry, [], LocalBorderNodes(last)),
+        (entry, [LocalBorderNodes(mid)], LocalBorderNodes(last)),
+    ]
+
+
+def run(
+    graphs: list[ig.Graph], max_expansions: int
+) -> dict[tuple[str, bool], tuple[int, int, int, float]]:
+    results = {}
+    for name, prune in ((name, prune) for name in NEIGHBOR_ORDERINGS for prune in (False, True)):
+        rng = random.Random(0)
+        found, total, expansions, elapsed = 0, 0, 0, 0.0
+        for graph in graphs:
+            for entry, mid_borders, last_border in make_queries(graph, rng):
+                budget = SearchBudget(max_expansions=max_expansions).start()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    found_path, _, _ = modified_dfs(
+                        graph, entry, mid_borders, last_border, budget, name, prune
+                    )
+                elapsed += time.perf_counter() - start
+                found += found_path
+                total += 1
+                expansions += budget.expansions
+        results[name, prune] = (found, total, expansions, elapsed)
+    return results
+
+
+def main(triplets_path: str | None, max_expansions: int):
+    suites = synthetic_graphs()
+    if triplets_path:
+        graph = build_graph_from_triplets(TripletCheckpoint(triplets_path).iter_triplets())
+        suites["communities"] = community_graphs(graph)
+    else:
+        suites["communities"] = community_graphs(ig.Graph.Barabasi(2000, 2))
+
+    print(
+        f"{'suite':>15} {'ordering':>11} {'prune':>6} {'found':>9} {'expansions':>11} {'seconds':>8}"
+    )
+    for suite, graphs in suites.items():
+        for (name, prune), (found, total, expansions, elapsed) in run(graphs, max_expansions).items():
+            print(
+                f"{suite:>15} {name:>11} {str(prune):>6} {found:>4}/{total:<4} "
+                f"{expansions:>11} {elapsed:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else None,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50_000,
+    )
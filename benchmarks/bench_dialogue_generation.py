@@ -0,0 +1,104 @@
+"""
+Benchmark for streaming dialogue generation against the fake LLM backend.
+A TripletGraph is built from synthetic triplets and a dialogue is generated
+along its global traversal, once without interruption and once interrupted
+halfway and resumed from the checkpoint. Both dialogues must be identical.
+Reports step types, throughput, the most turns buffered while waiting for an
+earlier step and peak memory allocated during generation.
+
+Usage: python benchmarks/bench_dialogue_generation.py [num_triplets] [latency_mean_seconds]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from bench_graph_construction import generate_triplets
+
+from docudialogue.dialogue.checkpoint import DialogueCheckpoint
+from docudialogue.dialogue.dialogue_generator import DialogueGenerator, iter_dialogue_steps
+from docudialogue.graphs.triplet_handler import TripletGraph
+from docudialogue.llm_wrappers.fake_model import FakeLLMModel
+
+GRAPH_CONFIG = {"traversal": {"time_budget_seconds": None}}
+
+
+def make_generator(latency_mean: float) -> DialogueGenerator:
+    return DialogueGenerator(
+        FakeLLMModel(
+            latency_distribution="lognormal",
+            latency_mean=latency_mean,
+            latency_std=latency_mean / 2,
+        ),
+        max_concurrent=64,
+        max_pending_steps=256,
+    )
+
+
+async def generate(
+    triplet_graph: TripletGraph, path: str, latency_mean: float, timeout: float | None = None
+) -> DialogueGenerator:
+    generator = make_generator(latency_mean)
+    checkpoint = DialogueCheckpoint(path)
+    try:
+        await asyncio.wait_for(generator.generate(triplet_graph, checkpoint), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        checkpoint.close()
+    return generator
+
+
+def read_records(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def main(num_triplets: int, latency_mean: float):
+    start = time.perf_counter()
+    triplet_graph = TripletGraph(generate_triplets(num_triplets), GRAPH_CONFIG)
+    num_steps = len(triplet_graph.global_traversal)
+    print(
+        f"Graph with {triplet_graph.graph.vcount()} nodes and {num_steps} traversal steps "
+        f"built in {time.perf_counter() - start:.1f}s"
+    )
+    step_types = Counter(step.type.value for step in iter_dialogue_steps(triplet_graph))
+    print(f"Step types: {dict(step_types)}")
+
+    with tempfile.TemporaryDirectory() as folder_path:
+        full_path = os.path.join(folder_path, "full.jsonl")
+        tracemalloc.start()
+        generator = asyncio.run(generate(triplet_graph, full_path, latency_mean))
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = generator.stats
+        print(
+            f"Full run: {stats['written']} steps in {stats['seconds']:.1f}s "
+            f"({stats['written'] / stats['seconds']:.0f} steps/s), "
+            f"at most {stats['max_buffered']} turns buffered, "
+            f"peak {peak_memory / 2**20:.1f} MB allocated"
+        )
+
+        resumed_path = os.path.join(folder_path, "resumed.jsonl")
+        interrupted = asyncio.run(
+            generate(triplet_graph, resumed_path, latency_mean, timeout=stats["seconds"] / 2)
+        )
+        resumed = asyncio.run(generate(triplet_graph, resumed_path, latency_mean))
+        print(
+            f"Interrupted after {interrupted.stats['written']} steps, "
+            f"resumed run wrote the remaining {resumed.stats['written']}"
+        )
+        assert read_records(resumed_path) == read_records(full_path), "dialogues differ"
+        print("Resumed dialogue is identical to the uninterrupted one")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 40_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.2,
+    )
@@ -0,0 +1,94 @@
+"""
+End to end throughput benchmark without API calls: triplet extraction runs
+against the fake LLM backend, then the triplet graph (communities and traversal
+order) is built from the extracted triplets.
+
+Usage: python benchmarks/bench_fake_llm_pipeline.py [num_docs] [chunks_per_doc] [latency_mean_seconds]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from docudialogue.graphs.triplet_handler import TripletGraph
+from docudialogue.triplet_extraction.triplet_extractor import TripletExtractionPipeline
+
+VOCABULARY_SIZE = 2000
+WORDS_PER_CHUNK = 300
+
+
+def make_docs(num_docs: int, chunks_per_doc: int) -> list[list[str]]:
+    rng = random.Random(0)
+    # Letters only, the fake backend takes entity names from alphabetic words
+    vocabulary = [
+        "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=8))
+        for _ in range(VOCABULARY_SIZE)
+    ]
+    # Zipf-like weights so that some words (entities) appear in many chunks
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    return [
+        [
+            " ".join(rng.choices(vocabulary, weights, k=WORDS_PER_CHUNK))
+            for _ in range(chunks_per_doc)
+        ]
+        for _ in range(num_docs)
+    ]
+
+
+async def extract(docs: list[list[str]], latency_mean: float):
+    config = {
+        "extractor_type": "combined",
+        "entity_types": ["PERSON", "ORGANIZATION"],
+        "entity_extractor_type": "",
+        "llm": {
+            "backend": "fake",
+            "fake": {
+                "latency_distribution": "lognormal",
+                "latency_mean_seconds": latency_mean,
+                "latency_std_seconds": latency_mean / 2,
+                "rate_limit_error_rate": 0.01,
+                "error_rate": 0.01,
+            },
+        },
+        "rate_limit": {
+            "requests_per_minute": 100000,
+            "tokens_per_minute": 100000000,
+            "initial_concurrency": 16,
+            "max_concurrency": 128,
+        },
+        "retry": {"max_attempts": 5, "base_delay": 0.05, "max_delay": 1},
+    }
+    pipeline = TripletExtractionPipeline(config)
+    triplets = await pipeline.run(docs)
+    return triplets, pipeline._model
+
+
+def main(num_docs: int, chunks_per_doc: int, latency_mean: float):
+    docs = make_docs(num_docs, chunks_per_doc)
+    num_chunks = num_docs * chunks_per_doc
+
+    start = time.perf_counter()
+    triplets, model = asyncio.run(extract(docs, latency_mean))
+    extraction_time = time.perf_counter() - start
+    print(
+        f"Extraction: {num_chunks} chunks in {extraction_time:.2f}s "
+        f"({num_chunks / extraction_time:.1f} chunks/s, {model.num_calls} calls, "
+        f"{model.num_errors} injected errors, {len(triplets)} triplets)"
+    )
+
+    start = time.perf_counter()
+    graph = TripletGraph(triplets)
+    graph_time = time.perf_counter() - start
+    print(
+        f"Graph: {graph._graph.vcount()} nodes, {graph._graph.ecount()} edges, "
+        f"{len(graph.global_traversal)} traversal steps in {graph_time:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0.05,
+    )
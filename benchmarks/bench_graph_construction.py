@@ -0,0 +1,52 @@
+"""
+Benchmark for building the triplet graph from synthetic triplets.
+Time per triplet should stay flat as the number of triplets grows.
+
+Usage: python benchmarks/bench_graph_construction.py [max_triplets]
+"""
+
+import random
+import sys
+import time
+
+from docudialogue.graphs.graph_builder import build_graph_from_triplets
+from docudialogue.triplet_extraction.classes import Entity, Relationship, Triplet
+
+
+def generate_triplets(num_triplets: int, seed: int = 0) -> list[Triplet]:
+    rng = random.Random(seed)
+    num_entities = max(10, num_triplets // 4)
+    types = ["PERSON", "ORGANIZATION", "GEO", "EVENT"]
+    entities = [
+        Entity(f"ENTITY {i}", types[i % len(types)], f"Description {i}")
+        for i in range(num_entities)
+    ]
+    triplets = []
+    for i in range(num_triplets):
+        subject = entities[rng.randrange(num_entities)]
+        object = entities[rng.randrange(num_entities)]
+        relationship = Relationship(f"Relationship {i % 50}", rng.randint(1, 10))
+        triplets.append(Triplet(subject, relationship, object))
+    return triplets
+
+
+def main(max_triplets: int = 200_000):
+    sizes = []
+    size = max_triplets
+    while size >= 10_000:
+        sizes.append(size)
+        size //= 2
+    print(f"{'triplets':>10} {'nodes':>8} {'edges':>8} {'seconds':>9} {'us/triplet':>11}")
+    for size in reversed(sizes):
+        triplets = generate_triplets(size)
+        start = time.perf_counter()
+        graph = build_graph_from_triplets(triplets)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{size:>10} {graph.vcount():>8} {graph.ecount():>8} "
+            f"{elapsed:>9.3f} {elapsed / size * 1e6:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
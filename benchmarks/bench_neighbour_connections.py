@@ -0,0 +1,104 @@
+"""
+Scaling benchmark for find_neighbour_connections on graphs made of many small
+communities (a ring of cliques with random edges between cliques).
+The single pass implementation is compared with the previous one, which
+rescanned every crossing edge once per community, on the smaller sizes,
+and both results are checked to be the same.
+Time per edge should stay flat as the number of communities grows.
+
+Usage: python benchmarks/bench_neighbour_connections.py [clique_size]
+"""
+
+import random
+import sys
+import time
+
+import igraph as ig
+import leidenalg
+
+from docudialogue.graphs.graph_utils import (
+    CommunityNeighbourConnections,
+    find_neighbour_connections,
+)
+
+COMMUNITY_COUNTS = (250, 500, 1_000, 5_000, 10_000, 20_000, 50_000)
+# The previous implementation is quadratic, 1000 communities already take minutes
+MAX_COMMUNITIES_PREVIOUS = 500
+
+
+def make_graph(num_communities: int, clique_size: int) -> tuple[ig.Graph, list[int]]:
+    rng = random.Random(num_communities)
+    edges = []
+    for community_id in range(num_communities):
+        first = community_id * clique_size
+        members = range(first, first + clique_size)
+        edges.extend((u, v) for u in members for v in members if u < v)
+        # Ring between consecutive communities plus one random connection
+        next_first = (community_id + 1) % num_communities * clique_size
+        edges.append((first, next_first))
+        other = rng.randrange(num_communities) * clique_size + rng.randrange(clique_size)
+        edges.append((first + clique_size - 1, other))
+    graph = ig.Graph(n=num_communities * clique_size, edges=edges).simplify()
+    membership = [node_id // clique_size for node_id in range(graph.vcount())]
+    return graph, membership
+
+
+def previous_find_neighbour_connections(
+    graph: ig.Graph, partition: leidenalg.ModularityVertexPartition
+) -> dict[int, CommunityNeighbourConnections]:
+    outside_connections = {}
+    for community_id in range(len(partition.subgraphs())):
+        connections = CommunityNeighbourConnections(community_id)
+        for edge_id, crossing_exists in enumerate(partition.crossing()):
+            if crossing_exists:
+                node1, node2 = graph.es[edge_id].tuple
+                if partition.membership[node1] == community_id:
+                    curr_node, neighbor_node = node1, node2
+                elif partition.membership[node2] == community_id:
+                    curr_node, neighbor_node = node2, node1
+                else:
+                    continue
+                connections.add_connection(
+                    partition.membership[neighbor_node], (curr_node, edge_id, neighbor_node)
+                )
+        outside_connections[community_id] = connections
+    return outside_connections
+
+
+def same_connections(
+    first: dict[int, CommunityNeighbourConnections],
+    second: dict[int, CommunityNeighbourConnections],
+) -> bool:
+    return first.keys() == second.keys() and all(
+        dict(first[key].connections) == dict(second[key].connections) for key in first
+    )
+
+
+def main(clique_size: int):
+    print(
+        f"{'communities':>11} {'edges':>8} {'crossing':>8} {'seconds':>8} "
+        f"{'us/edge':>8} {'previous':>9}"
+    )
+    for num_communities in COMMUNITY_COUNTS:
+        graph, membership = make_graph(num_communities, clique_size)
+        partition = leidenalg.ModularityVertexPartition(graph, initial_membership=membership)
+        num_crossing = sum(partition.crossing())
+
+        start = time.perf_counter()
+        connections = find_neighbour_connections(graph, partition)
+        elapsed = time.perf_counter() - start
+
+        previous = ""
+        if num_communities <= MAX_COMMUNITIES_PREVIOUS:
+            start = time.perf_counter()
+            expected = previous_find_neighbour_connections(graph, partition)
+            previous = f"{time.perf_counter() - start:>9.2f}"
+            assert same_connections(connections, expected), "results differ"
+        print(
+            f"{num_communities:>11} {graph.ecount():>8} {num_crossing:>8} {elapsed:>8.3f} "
+            f"{elapsed / graph.ecount() * 1e6:>8.2f} {previous}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
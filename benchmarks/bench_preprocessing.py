@@ -0,0 +1,41 @@
+"""
+Throughput benchmark for document preprocessing (PDF parsing, cleaning and splitting)
+with an increasing number of worker processes.
+
+Usage: python benchmarks/bench_preprocessing.py <pdf_directory> [max_workers]
+"""
+
+import os
+import sys
+import time
+
+from docudialogue.input_handler.input_pipeline import preprocess_files
+
+CONFIG = {"split_length": 500, "split_overlap": 20}
+
+
+def main(directory: str, max_workers: int):
+    file_paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(".pdf")
+    )
+    if not file_paths:
+        raise ValueError(f"No PDF files found in {directory}")
+    print(f"{len(file_paths)} files")
+    print(f"{'workers':>8} {'seconds':>9} {'files/s':>9} {'chunks/s':>9} {'failed':>7}")
+    num_workers = 1
+    while num_workers <= max_workers:
+        start = time.perf_counter()
+        docs, errors = preprocess_files(file_paths, CONFIG, num_workers)
+        elapsed = time.perf_counter() - start
+        num_chunks = sum(len(doc) for doc in docs)
+        print(
+            f"{num_workers:>8} {elapsed:>9.2f} {len(file_paths) / elapsed:>9.2f} "
+            f"{num_chunks / elapsed:>9.1f} {len(errors):>7}"
+        )
+        num_workers *= 2
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count())
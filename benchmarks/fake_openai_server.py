@@ -0,0 +1,130 @@
+"""
+Local OpenAI-compatible server for exercising rate limiting without API credits.
+It answers POST /v1/chat/completions, enforces a requests-per-minute limit by
+returning 429s with retry-after and x-ratelimit-* headers, and can inject
+additional random 429s. Structured output requests get a minimal instance of
+the requested JSON schema.
+
+Usage:
+    python benchmarks/fake_openai_server.py --port 8000 --rpm 120 --error-rate 0.05
+and set "base_url": "http://localhost:8000/v1" in the "llm" section of a stage.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def instance_from_schema(schema: dict, defs: dict) -> object:
+    if "$ref" in schema:
+        return instance_from_schema(defs[schema["$ref"].split("/")[-1]], defs)
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        return {
+            name: instance_from_schema(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        return [instance_from_schema(schema["items"], defs)]
+    if schema_type == "integer":
+        return 1
+    if schema_type == "number":
+        return 1.0
+    if schema_type == "boolean":
+        return True
+    return "fake"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    rpm = 60
+    error_rate = 0.0
+    latency = 0.1
+    _request_times = deque()
+    _lock = threading.Lock()
+
+    def _send_json(self, status: int, body: dict, headers: dict) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        now = time.monotonic()
+        with self._lock:
+            while self._request_times and now - self._request_times[0] > 60:
+                self._request_times.popleft()
+            over_limit = len(self._request_times) >= self.rpm
+            if not over_limit:
+                self._request_times.append(now)
+            remaining = self.rpm - len(self._request_times)
+            reset = 60 - (now - self._request_times[0]) if self._request_times else 0
+        headers = {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(max(remaining, 0)),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+        }
+        if over_limit or random.random() < self.error_rate:
+            headers["retry-after"] = f"{max(reset, 1):.3f}" if over_limit else "1"
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                headers,
+            )
+            return
+
+        time.sleep(self.latency)
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            content = json.dumps(instance_from_schema(schema, schema.get("$defs", {})))
+        else:
+            content = "fake"
+        self._send_json(
+            200,
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            },
+            headers,
+        )
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--rpm", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    FakeOpenAIHandler.rpm = args.rpm
+    FakeOpenAIHandler.error_rate = args.error_rate
+    FakeOpenAIHandler.latency = args.latency
+    server = ThreadingHTTPServer(("localhost", args.port), FakeOpenAIHandler)
+    print(f"Fake OpenAI server listening on http://localhost:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
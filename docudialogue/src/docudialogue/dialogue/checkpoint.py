@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import time
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class DialogueCheckpoint:
+    """
+    Append-only JSONL sink of generated dialogue turns.
+    Each line holds one step of the global traversal together with its turn,
+    and lines are written in step order, so an interrupted generation can be
+    resumed from the step after the last one in the file. Stored records are
+    only changed by replace, which rewrites the whole file.
+    Records are buffered until flush, which syncs the file to disk at most once
+    every sync_interval seconds. Records lost in a crash are generated again
+    on resume, so syncing each of them is not needed.
+    """
+
+    def __init__(self, path: str, sync_interval: float = 1.0) -> None:
+        folder_path = os.path.dirname(path)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        self._path = path
+        self._sync_interval = sync_interval
+        self._last_sync = time.monotonic()
+        self.num_steps = 0
+        self.last_record: dict | None = None
+        self._load()
+        self._file = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def iter_records(self) -> Iterator[dict]:
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, "r", encoding="utf-8") as f:
+            for line_idx, line in enumerate(f):
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line can be incomplete if the process crashed while writing it
+                    logger.warning(f"Skipping corrupted dialogue line {line_idx}")
+
+    def _load(self) -> None:
+        for record in self.iter_records():
+            if record["step"] != self.num_steps:
+                raise ValueError(
+                    f"Dialogue checkpoint {self._path} is out of order: "
+                    f"expected step {self.num_steps}, found {record['step']}"
+                )
+            self.num_steps += 1
+            self.last_record = record
+        if self.num_steps:
+            logger.info(f"Loaded dialogue checkpoint with {self.num_steps} steps")
+        # Make sure a new record does not continue a partially written line
+        if os.path.exists(self._path) and os.path.getsize(self._path) > 0:
+            with open(self._path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                ends_with_newline = f.read(1) == b"\n"
+            if not ends_with_newline:
+                with open(self._path, "a", encoding="utf-8") as f:
+                    f.write("\n")
+
+    def write(self, record: dict) -> None:
+        if record["step"] != self.num_steps:
+            raise ValueError(f"Expected step {self.num_steps}, got {record['step']}")
+        if self._file is None:
+            self._file = open(self._path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.num_steps += 1
+        self.last_record = record
+
+    def flush(self, sync: bool = False) -> None:
+        """Writes buffered records, and syncs them if sync_interval has passed or sync is set."""
+        if self._file is None:
+            return
+        self._file.flush()
+        if sync or time.monotonic() - self._last_sync >= self._sync_interval:
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+
+    def replace(self, records: dict[int, dict]) -> None:
+        """Replaces stored records of the given steps, the file is swapped atomically."""
+        if not records:
+            return
+        self.close()
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self.iter_records():
+                record = records.get(record["step"], record)
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path)
+        if self.last_record is not None:
+            self.last_record = records.get(self.last_record["step"], self.last_record)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush(sync=True)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,54 @@
+from enum import Enum
+
+
+class StepType(Enum):
+    """How the global traversal gets to a node."""
+
+    START = "start"
+    # From the previous node over an edge
+    FORWARD = "forward"
+    # From a node visited earlier than the previous one
+    RETURN = "return"
+    # Into a different community of the same community group
+    COMMUNITY_SWITCH = "community_switch"
+    # Into a different community group, there is no edge from the parent
+    GROUP_SWITCH = "group_switch"
+
+
+class DialogueStep:
+    def __init__(
+        self,
+        index: int,
+        type: StepType,
+        node: int,
+        parent: int | None,
+        community: int,
+        group: int,
+    ) -> None:
+        self.index = index
+        self.type = type
+        self.node = node
+        self.parent = parent
+        self.community = community
+        self.group = group
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "DialogueStep":
+        return cls(
+            record["step"],
+            StepType(record["type"]),
+            record["node"],
+            record["parent"],
+            record["community"],
+            record["group"],
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "step": self.index,
+            "type": self.type.value,
+            "node": self.node,
+            "parent": self.parent,
+            "community": self.community,
+            "group": self.group,
+        }
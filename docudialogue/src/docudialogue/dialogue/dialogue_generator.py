@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import time
+from typing import Iterator
+
+from igraph import Graph
+
+from docudialogue.dialogue.checkpoint import DialogueCheckpoint
+from docudialogue.dialogue.classes import DialogueStep, StepType
+from docudialogue.graphs.triplet_handler import TripletGraph
+from docudialogue.llm_wrappers.llm_cache import LLMResponseCache
+from docudialogue.llm_wrappers.llm_wrappers import LLMModel, create_llm_model
+from docudialogue.llm_wrappers.prompts import DIALOGUE_TRANSITIONS, DIALOGUE_TURN_PROMPT
+from docudialogue.llm_wrappers.pydantic_classes import DialogueTurn
+from docudialogue.llm_wrappers.rate_limiter import AdaptiveRateLimiter
+from docudialogue.utils import RetryPolicy, run_concurrent_stream
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def iter_dialogue_steps(triplet_graph: TripletGraph, start: int = 0) -> Iterator[DialogueStep]:
+    """
+    Classifies steps of the global traversal, starting from step start.
+    Switching community group takes precedence over switching community, and
+    both over returning to a node visited earlier.
+    """
+    traversal = triplet_graph.global_traversal
+    parents = triplet_graph.global_traversal_parents
+    node_communities = triplet_graph.node_community_ids()
+    community_groups = triplet_graph.community_group_ids()
+    for index in range(start, len(traversal)):
+        node = traversal[index]
+        # First node has no parent, it is stored as -1 or None
+        parent = parents[index] if parents[index] is not None and parents[index] >= 0 else None
+        community = node_communities[node]
+        group = community_groups[community]
+        if index == 0 or parent is None:
+            step_type = StepType.START
+        else:
+            previous = traversal[index - 1]
+            if community_groups[node_communities[previous]] != group:
+                step_type = StepType.GROUP_SWITCH
+            elif node_communities[previous] != community:
+                step_type = StepType.COMMUNITY_SWITCH
+            elif parent != previous:
+                step_type = StepType.RETURN
+            else:
+                step_type = StepType.FORWARD
+        yield DialogueStep(index, step_type, node, parent, community, group)
+
+
+class DialogueGenerator:
+    """
+    Generates a two person dialogue along the global traversal of a TripletGraph,
+    one question and answer turn per step. Steps are classified and prompts
+    built lazily, turns are generated with at most max_concurrent LLM requests
+    in flight and written to a DialogueCheckpoint in step order as soon as all
+    earlier steps are written. Completed turns waiting for an earlier step are
+    buffered, and no step more than max_pending_steps ahead of the last
+    written one is started, so memory stays bounded for any traversal length.
+    A step that fails after all retries is written without a turn and with
+    its error, so the dialogue keeps its order. Failed steps are generated
+    again when the generation is resumed from the checkpoint.
+    """
+
+    def __init__(
+        self,
+        model: LLMModel,
+        model_name: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        rate_limiter: AdaptiveRateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        max_concurrent: int = 20,
+        max_pending_steps: int = 256,
+        progress_interval: float = 10.0,
+    ) -> None:
+        self.model = model
+        self.model_name = model_name
+        self.temperature = temperature
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.max_concurrent = max_concurrent
+        self.max_pending_steps = max(max_pending_steps, max_concurrent)
+        self.progress_interval = progress_interval
+        self.stats = {}
+
+    @classmethod
+    def from_config(
+        cls, config: dict | None, cache: LLMResponseCache | None = None
+    ) -> "DialogueGenerator":
+        """Reads the "dialogue" config section with its "llm", "rate_limit" and "retry" sections."""
+        config = config or {}
+        llm_config = config.get("llm", {})
+        return cls(
+            create_llm_model(llm_config, cache=cache),
+            model_name=llm_config.get("model_name", "gpt-4o-mini"),
+            temperature=llm_config.get("temperature", 0.7),
+            rate_limiter=AdaptiveRateLimiter.from_config(config.get("rate_limit")),
+            retry_policy=RetryPolicy.from_config(config.get("retry")),
+            max_concurrent=config.get("max_concurrent", 20),
+            max_pending_steps=config.get("max_pending_steps", 256),
+            progress_interval=config.get("progress_interval_seconds", 10.0),
+        )
+
+    @staticmethod
+    def _describe_node(graph: Graph, node: int | None) -> str:
+        if node is None:
+            return "None"
+        vertex = graph.vs[node]
+        description = vertex["desc"] or " ".join(vertex["descriptions"])
+        return f"{vertex['entity_name']} ({vertex['type']}): {description}"
+
+    @staticmethod
+    def _describe_edge(graph: Graph, source: int | None, target: int) -> str:
+        if source is None:
+            return "None"
+        edge_id = graph.get_eid(source, target, error=False)
+        if edge_id < 0:
+            return "None"
+        edge = graph.es[edge_id]
+        return edge["desc"] or " ".join(edge["descriptions"])
+
+    def _prompt(self, graph: Graph, step: DialogueStep) -> str:
+        return DIALOGUE_TURN_PROMPT.format(
+            transition=DIALOGUE_TRANSITIONS[step.type.value],
+            previous=self._describe_node(graph, step.parent),
+            current=self._describe_node(graph, step.node),
+            relationship=self._describe_edge(graph, step.parent, step.node),
+        )
+
+    async def _generate_turn(self, user_prompt: str) -> DialogueTurn:
+        return await self.model.parse(
+            system_prompt="",
+            user_prompt=user_prompt,
+            response_format=DialogueTurn,
+            model_name=self.model_name,
+            temperature=self.temperature,
+        )
+
+    def _check_resumable(
+        self, triplet_graph: TripletGraph, checkpoint: DialogueCheckpoint
+    ) -> list[DialogueStep]:
+        """
+        Makes sure every stored step visits the same node as the traversal.
+        Returns the stored steps that failed.
+        """
+        traversal = triplet_graph.global_traversal
+        failed_steps = []
+        if checkpoint.num_steps > len(traversal):
+            raise ValueError(
+                f"Dialogue checkpoint {checkpoint.path} was written for a different traversal"
+            )
+        for record in checkpoint.iter_records():
+            if record["node"] != traversal[record["step"]]:
+                raise ValueError(
+                    f"Dialogue checkpoint {checkpoint.path} was written for a different traversal: "
+                    f"step {record['step']} visits node {record['node']} instead of {traversal[record['step']]}"
+                )
+            if record.get("error") is not None:
+                failed_steps.append(DialogueStep.from_dict(record))
+        return failed_steps
+
+    async def _regenerate_failed(
+        self, graph: Graph, failed_steps: list[DialogueStep], checkpoint: DialogueCheckpoint
+    ) -> None:
+        """Generates turns of steps that failed earlier and replaces their records."""
+        steps = {step.index: step for step in failed_steps}
+        regenerated: dict[int, dict] = {}
+
+        async def keyed_funcs():
+            for step in failed_steps:
+                yield step.index, lambda s=step: self._generate_turn(self._prompt(graph, s))
+
+        async def on_result(index: int, turn: DialogueTurn):
+            record = steps[index].to_dict()
+            record.update(question=turn.question, answer=turn.answer)
+            regenerated[index] = record
+
+        async def on_error(index: int, error: BaseException):
+            logger.warning(f"Dialogue step {index} failed again: {error!r}")
+
+        await run_concurrent_stream(
+            keyed_funcs(),
+            on_result,
+            on_error,
+            max_concurrent=self.max_concurrent,
+            rate_limiter=self.rate_limiter,
+            retry_policy=self.retry_policy,
+        )
+        checkpoint.replace(regenerated)
+        self.stats["regenerated"] = len(regenerated)
+        logger.info(f"Regenerated {len(regenerated)}/{len(failed_steps)} failed dialogue steps")
+
+    async def generate(self, triplet_graph: TripletGraph, checkpoint: DialogueCheckpoint) -> None:
+        """
+        Generates turns for stored steps that failed and for all steps not yet
+        in the checkpoint, which are written in order.
+        """
+        failed_steps = self._check_resumable(triplet_graph, checkpoint)
+        start = time.monotonic()
+        num_total = len(triplet_graph.global_traversal)
+        first_step = checkpoint.num_steps
+        graph = triplet_graph.graph
+        self.stats = {
+            "steps": num_total - first_step,
+            "written": 0,
+            "failed": 0,
+            "regenerated": 0,
+            "max_buffered": 0,
+        }
+        logger.info(
+            f"{first_step} dialogue steps found in checkpoint, {len(failed_steps)} of them failed, "
+            f"{num_total - first_step} steps left to generate."
+        )
+        if failed_steps:
+            await self._regenerate_failed(graph, failed_steps, checkpoint)
+        if first_step == num_total:
+            self.stats["seconds"] = time.monotonic() - start
+            return
+        # Steps in flight, and finished records waiting for an earlier step
+        in_flight: dict[int, DialogueStep] = {}
+        finished: dict[int, dict] = {}
+        window = asyncio.Condition()
+        last_report = time.monotonic()
+
+        async def keyed_funcs():
+            for step in iter_dialogue_steps(triplet_graph, first_step):
+                async with window:
+                    await window.wait_for(
+                        lambda: step.index - checkpoint.num_steps < self.max_pending_steps
+                    )
+                in_flight[step.index] = step
+                yield step.index, lambda s=step: self._generate_turn(self._prompt(graph, s))
+
+        async def finish(index: int, record: dict):
+            nonlocal last_report
+            finished[index] = record
+            self.stats["max_buffered"] = max(self.stats["max_buffered"], len(finished))
+            if checkpoint.num_steps not in finished:
+                return
+            while checkpoint.num_steps in finished:
+                checkpoint.write(finished.pop(checkpoint.num_steps))
+                self.stats["written"] += 1
+            checkpoint.flush()
+            async with window:
+                window.notify_all()
+            if time.monotonic() - last_report >= self.progress_interval:
+                last_report = time.monotonic()
+                self._log_progress(checkpoint.num_steps, num_total, start)
+
+        async def on_result(index: int, turn: DialogueTurn):
+            record = in_flight.pop(index).to_dict()
+            record.update(question=turn.question, answer=turn.answer)
+            await finish(index, record)
+
+        async def on_error(index: int, error: BaseException):
+            record = in_flight.pop(index).to_dict()
+            record.update(question=None, answer=None, error=repr(error))
+            self.stats["failed"] += 1
+            await finish(index, record)
+
+        await run_concurrent_stream(
+            keyed_funcs(),
+            on_result,
+            on_error,
+            max_concurrent=self.max_concurrent,
+            rate_limiter=self.rate_limiter,
+            retry_policy=self.retry_policy,
+        )
+        self.stats["seconds"] = time.monotonic() - start
+        self._log_progress(checkpoint.num_steps, num_total, start)
+        if self.stats["failed"]:
+            logger.warning(f"{self.stats['failed']} dialogue steps failed and were written without a turn")
+        if self.rate_limiter is not None:
+            logger.info(f"Dialogue rate limiter stats: {self.rate_limiter.stats()}")
+
+    def _log_progress(self, num_written: int, num_total: int, start: float) -> None:
+        elapsed = time.monotonic() - start
+        logger.info(
+            f"Written {num_written}/{num_total} dialogue steps in {elapsed:.1f}s "
+            f"({self.stats['written'] / max(elapsed, 1e-9):.1f} steps/s)"
+        )
@@ -1,11 +1,30 @@
+import asyncio
 import json
 import logging
 import os
-from typing import Any, List, Tuple
+from typing import Any, Iterable, List
 from haystack import Document
 
+from docudialogue.dialogue.checkpoint import DialogueCheckpoint
+from docudialogue.dialogue.dialogue_generator import DialogueGenerator
+from docudialogue.graphs.description_compaction import DescriptionCompactor
+from docudialogue.graphs.description_summarizer import DescriptionSummarizer
+from docudialogue.graphs.graph_builder import (
+    TripletGraphBuilder,
+    build_graph_from_triplets,
+)
+from docudialogue.graphs.summary_cache import SummaryCache
 from docudialogue.graphs.triplet_handler import TripletGraph
-from docudialogue.input_handler.input_pipeline import PreprocessingPipeline
+from docudialogue.input_handler.input_pipeline import (
+    preprocess_files,
+    stream_preprocessed_files,
+)
+from docudialogue.llm_wrappers.client_pool import (
+    close_openai_clients,
+    configure_client_pool,
+)
+from docudialogue.llm_wrappers.llm_cache import LLMResponseCache
+from docudialogue.triplet_extraction.checkpoint import TripletCheckpoint
 from docudialogue.triplet_extraction.classes import Triplet
 from docudialogue.triplet_extraction.triplet_extractor import TripletExtractionPipeline
 from docudialogue.utils import load_pickle, save_pickle
@@ -20,6 +39,9 @@ class DocumentPipeline:
     def __init__(self, config_path: str = "config.json"):
         self._config = self._load_config(config_path)
         self._cache_folder_path = self._config["cache_folder_path"]
+        self._llm_cache = LLMResponseCache.from_config(self._config.get("llm_cache", {}))
+        self._summary_cache = SummaryCache.from_config(self._config.get("summary_cache", {}))
+        configure_client_pool(self._config.get("llm_client"))
 
     async def run(self, file_paths: List[str]):
         # Step 1: Preprocess documents
@@ -27,42 +49,154 @@ class DocumentPipeline:
         # Step 2: Extract triplets from each chunk
         triplets = await self._extract_triplets(docs)
         # Step 3: Create triplet graph
-        graph = self._create_triplet_graph(triplets)
-        conversation = self._create_conversation(graph)
+        graph = await self._create_triplet_graph(triplets)
+        conversation_path = await self._create_conversation(graph)
 
+    async def run_streaming(self, file_paths: List[str]):
+        """
+        Same steps as run, but overlapped: chunks of each file are sent to
+        extraction as soon as the file is parsed, and extracted triplets are
+        folded into the graph builder while extraction is still running.
+        Queues between the stages are bounded, so a slow stage makes the
+        previous one wait instead of buffering everything in memory.
+        """
+        preprocessing_config = self._config["preprocessing_pipeline"]
+        streaming_config = self._config.get("streaming", {})
+        checkpoint = TripletCheckpoint(
+            os.path.join(self._cache_folder_path, "triplets.jsonl")
+        )
+        triplet_extraction_pipeline = TripletExtractionPipeline(
+            self._config["triplet_extraction"], cache=self._llm_cache
+        )
+        builder = TripletGraphBuilder(
+            DescriptionCompactor.from_config(self._config["graph"].get("compaction"))
+        )
+        triplet_queue = asyncio.Queue(maxsize=streaming_config.get("triplet_queue_size", 64))
+
+        async def docs():
+            async for doc_idx, doc in stream_preprocessed_files(
+                file_paths,
+                preprocessing_config,
+                preprocessing_config.get("num_workers", 1),
+            ):
+                yield doc_idx, [chunk.content for chunk in doc]
+
+        async def build_graph():
+            while True:
+                triplets = await triplet_queue.get()
+                if triplets is None:
+                    return
+                builder.add_all(triplets)
+
+        builder_task = asyncio.create_task(build_graph())
+        try:
+            skipped_hashes = await triplet_extraction_pipeline.run_stream(
+                docs(), checkpoint, triplet_queue.put
+            )
+            await triplet_queue.put(None)
+            await builder_task
+        finally:
+            builder_task.cancel()
+            checkpoint.close()
+        # Chunks completed by an earlier run are read back from the checkpoint
+        builder.add_all(checkpoint.iter_triplets(skipped_hashes))
+        logger.info(
+            f"Graph builder holds {builder.vcount()} nodes and {builder.ecount()} edges"
+        )
+        if self._llm_cache is not None:
+            logger.info(f"LLM cache stats: {self._llm_cache.stats()}")
+        graph = await self._create_triplet_graph(builder)
+        conversation_path = await self._create_conversation(graph)
+
+    async def close(self):
+        """Close shared LLM connections, the response cache and the summary cache."""
+        await close_openai_clients()
+        if self._llm_cache is not None:
+            self._llm_cache.close()
+        if self._summary_cache is not None:
+            self._summary_cache.close()
 
     def _load_config(self, config_path: str) -> None:
         config = json.load(open(config_path, "r"))
         return config
 
-    def _preprocess_documents(self, file_paths: List[str]) -> None:
-        preprocessing_pipeline = PreprocessingPipeline(self._config["preprocessing_pipeline"])
-        docs = [
-            preprocessing_pipeline.run(path)["document_splitter"]["documents"]
-            for path in file_paths
-        ]
+    def _preprocess_documents(self, file_paths: List[str]) -> list[list[Document]]:
+        preprocessing_config = self._config["preprocessing_pipeline"]
+        docs, _ = preprocess_files(
+            file_paths, preprocessing_config, preprocessing_config.get("num_workers", 1)
+        )
         logger.info(f"Document was split into {len(docs)} documents")
         return docs
     
-    async def _extract_triplets(self, docs: list[list[Document]]) -> list[Triplet]:
-        triplet_extraction_pipeline = TripletExtractionPipeline(self._config["triplet_extraction"])
-        triplets = await triplet_extraction_pipeline.run(
-            [[chunk.content for chunk in doc] for doc in docs]
+    async def _extract_triplets(self, docs: list[list[Document]]) -> Iterable[Triplet]:
+        """
+        Extract triplets into an append-only checkpoint in the cache folder. If a
+        previous run was interrupted, chunks already in the checkpoint are skipped.
+        Triplets are streamed back from the checkpoint instead of being held in memory.
+        """
+        texts = [[chunk.content for chunk in doc] for doc in docs]
+        checkpoint = TripletCheckpoint(
+            os.path.join(self._cache_folder_path, "triplets.jsonl")
         )
-        logger.info(f"Total number of triplets: {len(triplets)}")
-        self._save(triplets, "triplets", self._cache_folder_path)
-        return triplets
+        triplet_extraction_pipeline = TripletExtractionPipeline(
+            self._config["triplet_extraction"], cache=self._llm_cache
+        )
+        try:
+            await triplet_extraction_pipeline.run_to_checkpoint(texts, checkpoint)
+        finally:
+            checkpoint.close()
+        chunk_hashes = {TripletCheckpoint.hash_chunk(text) for doc in texts for text in doc}
+        logger.info(f"Total number of triplets: {checkpoint.num_triplets(chunk_hashes)}")
+        if self._llm_cache is not None:
+            logger.info(f"LLM cache stats: {self._llm_cache.stats()}")
+        return checkpoint.iter_triplets(chunk_hashes)
 
-    def _create_triplet_graph(self, triplets: list[Triplet]) -> TripletGraph:
-        triplet_graph = TripletGraph(triplets)
+    async def _create_triplet_graph(
+        self, triplets: Iterable[Triplet] | TripletGraphBuilder
+    ) -> TripletGraph:
+        """
+        If summarization is enabled in the graph config, descriptions are
+        summarized before communities are created, since communities copy them.
+        """
+        graph_config = self._config["graph"]
+        if graph_config.get("summarization", {}).get("enabled", False):
+            graph = (
+                triplets.build()
+                if isinstance(triplets, TripletGraphBuilder)
+                else build_graph_from_triplets(
+                    triplets, DescriptionCompactor.from_config(graph_config.get("compaction"))
+                )
+            )
+            summarizer = DescriptionSummarizer.from_config(
+                graph_config, cache=self._llm_cache, summary_cache=self._summary_cache
+            )
+            await summarizer.summarize_graph(graph)
+            triplets = graph
+        triplet_graph = TripletGraph(triplets, graph_config)
         logger.info(
             f"Triplet handler created with {triplet_graph._graph.vcount()} nodes and {triplet_graph._graph.ecount()} edges."
         )
         self._save(triplet_graph, "triplet_graph", self._cache_folder_path)
         return triplet_graph
     
-    def _create_conversation(self, triplet_graph: TripletGraph) -> List[Tuple[str, str]]:
-        pass
+    async def _create_conversation(self, triplet_graph: TripletGraph) -> str:
+        """
+        Generate the dialogue along the global traversal into an append-only JSONL
+        file in the cache folder and return its path. Turns are written in step
+        order as they complete, so an interrupted run continues after the last
+        written step.
+        """
+        checkpoint = DialogueCheckpoint(
+            os.path.join(self._cache_folder_path, "dialogue.jsonl")
+        )
+        generator = DialogueGenerator.from_config(
+            self._config.get("dialogue"), cache=self._llm_cache
+        )
+        try:
+            await generator.generate(triplet_graph, checkpoint)
+        finally:
+            checkpoint.close()
+        return checkpoint.path
 
     def _save(self, pickable_object: Any, pickable_name: str, folder_path: str):
         if not os.path.exists(folder_path):
@@ -71,6 +205,7 @@ class DocumentPipeline:
         save_pickle(pickable_object, path)
 
     def load(self, folder_path: str):
-        triplets = load_pickle(os.path.join(folder_path, "triplets.pkl"))
+        checkpoint = TripletCheckpoint(os.path.join(folder_path, "triplets.jsonl"))
+        triplets = list(checkpoint.iter_triplets())
         triplet_graph = load_pickle(os.path.join(folder_path, "triplet_graph.pkl"))
         return triplets, triplet_graph
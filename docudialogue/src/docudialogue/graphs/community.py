@@ -1,14 +1,29 @@
+import copy
+import logging
 from igraph import Graph
 
 from docudialogue.graphs.graph_utils import (
+    DEFAULT_NEIGHBOR_ORDERING,
     CommunityNeighbourConnections,
     GlobalBorderNodes,
     LocalBorderNodes,
+    SearchBudget,
+    approximate_traversal,
+    NodeMapping,
     map_nodes_between_graphs,
     modified_dfs,
-    summarize_descriptions,
 )
-from docudialogue.llm_wrappers.prompts import SUMMARIZE_GRAPH_PROMPT
+from docudialogue.graphs.community_summarizer import CommunitySummarizer
+from docudialogue.graphs.portfolio_search import PortfolioSearch
+from docudialogue.graphs.summary_cache import SummaryCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def _description(item) -> str:
+    """Summarized description of a vertex or edge, or its descriptions joined if not summarized."""
+    return item["desc"] or " ".join(item["descriptions"])
 
 
 class Community:
@@ -17,22 +32,68 @@ class Community:
     It contains methods for traversing the community and summarizing its contents.
     """
 
+    # Set by find_best_traversal_through_community
+    TRAVERSAL_ATTRIBUTES = (
+        "traversal_order",
+        "traversal_order_parents",
+        "traversal_order_loc",
+        "traversal_order_parents_loc",
+        "exits",
+        "traversal_mode",
+        "search_expansions",
+    )
+
     def __init__(
         self,
         id: int,
         parent_graph: Graph,
         graph: Graph,
         neighbour_connections: CommunityNeighbourConnections,
+        search_budget: SearchBudget | None = None,
+        neighbor_ordering: str = DEFAULT_NEIGHBOR_ORDERING,
+        portfolio: PortfolioSearch | None = None,
+        member_ids: list[int] | None = None,
     ) -> None:
+        """
+        member_ids are the parent graph ids of the community nodes, in the order
+        of subgraph nodes (as in partition membership). Without them, nodes are
+        matched by name.
+        """
         self.id = id
         self.parent_graph = parent_graph
         self.graph = graph
         self.neighbour_connections = neighbour_connections
-        self.mapped_nodes = map_nodes_between_graphs(parent_graph, graph)
+        self.mapped_nodes = (
+            NodeMapping(member_ids)
+            if member_ids is not None
+            else map_nodes_between_graphs(parent_graph, graph)
+        )
         self.traversal_order = None # To be set in traverse method
         self.traversal_order_parents = None # To be set in traverse method
+        self.search_budget = search_budget
+        self.neighbor_ordering = neighbor_ordering
+        self.portfolio = portfolio
+        # "dfs" or "approximate", to be set in traverse method
+        self.traversal_mode = None
+        self.search_expansions = None
         # self.summary = self.summarize_community()
 
+    def detached(self) -> "Community":
+        """
+        Copy that keeps only what the traversal needs: the structure of the
+        community graph, node mapping and neighbour connections.
+        It is cheap to send to a worker process.
+        """
+        community = copy.copy(self)
+        community.parent_graph = None
+        community.graph = Graph(n=self.graph.vcount(), edges=self.graph.get_edgelist())
+        community.portfolio = None
+        return community
+
+    def copy_traversal_from(self, other: "Community") -> None:
+        for attribute in self.TRAVERSAL_ATTRIBUTES:
+            setattr(self, attribute, getattr(other, attribute))
+
     def _split_borders_into_mid_and_last(
         self, borders_exit_nodes: list[LocalBorderNodes]
     ) -> tuple[list[LocalBorderNodes], LocalBorderNodes]:
@@ -60,7 +121,7 @@ class Community:
         that are in the end border and mid borders from entry_node_ids.
         """
         if entry_node_ids:
-            entry_node_ids_local = entry_node_ids.localize(self.mapped_nodes["parent_to_child"])
+            entry_node_ids_local = entry_node_ids.localize(self.mapped_nodes.parent_to_child)
         else:
             all_graph_node_ids: list[int] = self.graph.vs.indices
 
@@ -80,17 +141,10 @@ class Community:
         return entry_node_ids_local
     
     def format_chosen_borders(self, mid_borders_chosen_ids: list[int], best_attempt: list[int]) -> list[int]:
-        border_node_ids_global = []
-        if mid_borders_chosen_ids:
-            for node_id in mid_borders_chosen_ids:
-                border_node_ids_global.append(
-                    self.mapped_nodes["child_to_parent"][node_id]
-                )
+        border_node_ids_local = list(mid_borders_chosen_ids or [])
         if best_attempt:
-            border_node_ids_global.append(
-                self.mapped_nodes["child_to_parent"][best_attempt[-1]]
-            )
-        return border_node_ids_global
+            border_node_ids_local.append(best_attempt[-1])
+        return self.mapped_nodes.to_parent(border_node_ids_local)
 
     def _traverse(
         self,
@@ -101,23 +155,58 @@ class Community:
         """
         Traverse the community graph using a modified DFS algorithm.
         It finds the best path through the community graph and returns it.
-        It also returns the chosen mid borders.
-        """
-        best_attempt = []
-        path = []
-        mid_borders_chosen_ids = []
-        for start_id in entry_node_ids_local.node_ids:
-            found_path, path, mid_borders_chosen_ids = modified_dfs(
-                self.graph, start_id, mid_borders, last_border
+        It also returns the positions in the path where each mid border is exited.
+        Entry nodes are tried in order until a path is found or the search budget
+        runs out, in which case an approximate traversal is used instead.
+        With a portfolio, several entry nodes are searched at once in worker processes.
+        """
+        budget = self.search_budget.start() if self.search_budget is not None else None
+        found_path = False
+        if self.portfolio is not None and self.portfolio.applies(
+            self.graph, entry_node_ids_local.node_ids
+        ):
+            found_path, path, mid_exit_positions, expansions = self.portfolio.search(
+                self.graph,
+                entry_node_ids_local.node_ids,
+                mid_borders,
+                last_border,
+                budget,
+                self.neighbor_ordering,
             )
-            if not found_path:
-                raise NotImplementedError("TODO")
-            else:
-                best_attempt = path
-                break
+            if budget is not None:
+                budget.expansions = expansions
+        else:
+            for start_id in entry_node_ids_local.node_ids:
+                found_path, path, mid_exit_positions = modified_dfs(
+                    self.graph,
+                    start_id,
+                    mid_borders,
+                    last_border,
+                    budget,
+                    self.neighbor_ordering,
+                )
+                if found_path or (budget is not None and budget.exhausted):
+                    break
+        if found_path:
+            self.traversal_mode = "dfs"
+        else:
+            reason = (
+                "search budget exhausted"
+                if budget is not None and budget.exhausted
+                else "no path found"
+            )
+            logger.warning(
+                f"Modified DFS failed for community {self.id} with "
+                f"{self.graph.vcount()} nodes ({reason}), using approximate traversal"
+            )
+            path, mid_exit_positions = approximate_traversal(
+                self.graph, entry_node_ids_local.node_ids[0], mid_borders, last_border
+            )
+            self.traversal_mode = "approximate"
+        self.search_expansions = budget.expansions if budget is not None else None
+        best_attempt = path
         print(best_attempt)
-        global_exit_ids = self.format_chosen_borders(mid_borders_chosen_ids, best_attempt)
-        return best_attempt, global_exit_ids
+        return best_attempt, mid_exit_positions
 
     def find_best_traversal_through_community(
         self,
@@ -132,7 +221,7 @@ class Community:
         It also creates a traversal path and stores the traversal order and parents.
         """
         ordered_borders_exit_nodes_local = [
-            border_exit_nodes.localize(self.mapped_nodes["parent_to_child"])
+            border_exit_nodes.localize(self.mapped_nodes.parent_to_child)
             for border_exit_nodes in ordered_borders_exit_nodes
         ]
 
@@ -143,26 +232,42 @@ class Community:
             entry_node_ids, mid_borders, last_border
         )
 
-        best_attempt, global_exit_ids = self._traverse(entry_node_ids_local, mid_borders, last_border)
+        best_attempt, mid_exit_positions = self._traverse(
+            entry_node_ids_local, mid_borders, last_border
+        )
+        global_exit_ids = self.format_chosen_borders(
+            [best_attempt[position] for position in mid_exit_positions], best_attempt
+        )
 
-        self.create_traversal_path(best_attempt, global_exit_ids)
+        self.create_traversal_path(best_attempt, mid_exit_positions)
         return global_exit_ids
 
-    def create_traversal_path(self, path: list[int], border_node_ids: list[int]):
+    def create_traversal_path(self, path: list[int], mid_exit_positions: list[int]):
+        """
+        Keeps the first visit of every node in path, and the last node.
+        Exits are indices in the traversal order of the nodes at mid_exit_positions
+        in path, one per mid border, followed by the last node. A mid exit that
+        was visited before its position points to the first visit of that node.
+        """
         self.traversal_order_loc = []
         self.traversal_order_parents_loc = []
         visited = set()
+        # Index in traversal order of the first visit of each node
+        order_idx = {}
         for idx, node_id in enumerate(path):
             if idx == 0:
                 visited.add(node_id)
+                order_idx[node_id] = 0
                 self.traversal_order_parents_loc.append(-1)
                 self.traversal_order_loc.append(node_id)
             elif idx == len(path) - 1 and idx != 0:
                 parent_id = path[idx - 1]
+                order_idx.setdefault(node_id, len(self.traversal_order_loc))
                 self.traversal_order_parents_loc.append(parent_id)
                 self.traversal_order_loc.append(node_id)
             elif node_id not in visited:
                 visited.add(node_id)
+                order_idx[node_id] = len(self.traversal_order_loc)
                 self.traversal_order_loc.append(node_id)
                 if idx == 0:
                     self.traversal_order_parents_loc.append(-1)
@@ -170,33 +275,54 @@ class Community:
                     parent_id = path[idx - 1]
                     self.traversal_order_parents_loc.append(parent_id)
 
-        self.traversal_order = [
-            self.mapped_nodes["child_to_parent"][node_id]
-            for node_id in self.traversal_order_loc
-        ]
+        self.traversal_order = self.mapped_nodes.to_parent(self.traversal_order_loc)
         self.traversal_order_parents = [
-            self.mapped_nodes["child_to_parent"][node_id] if node_id != -1 else -1
+            self.mapped_nodes.child_to_parent[node_id] if node_id != -1 else -1
             for node_id in self.traversal_order_parents_loc
         ]
-        curr_exit_id = 0
-        mid_exits = border_node_ids[:-1]
-        self.exits = []
-        if mid_exits:
-            for idx, node_id in enumerate(self.traversal_order):
-                if node_id == mid_exits[curr_exit_id]:
-                    self.exits.append(idx)
-                    curr_exit_id += 1
-                    if curr_exit_id == len(mid_exits):
-                        break
+        self.exits = [order_idx[path[position]] for position in mid_exit_positions]
         self.exits.append(len(self.traversal_order) - 1)
 
-    async def summarize_community(self):
-        vertex_descriptions = [
-            desc for vertex in self.graph.vs for desc in vertex["desc"]
-        ]
-        edge_descriptions = [desc for edge in self.graph.es for desc in edge["desc"]]
-        descriptions = {
-            "vertex_descriptions": vertex_descriptions,
-            "edge_descriptions": edge_descriptions,
+    def summary_fingerprint(self, prompt_version: str) -> str:
+        """
+        Fingerprint of the community contents: member node names, edges as
+        (source, target) name pairs and their descriptions. Communities that
+        did not change after re-clustering keep the same fingerprint.
+        """
+        names = self.graph.vs["name"]
+        content = {
+            "nodes": sorted(
+                [vertex["name"], _description(vertex)] for vertex in self.graph.vs
+            ),
+            "edges": sorted(
+                [names[edge.source], names[edge.target], _description(edge)]
+                for edge in self.graph.es
+            ),
         }
-        return await summarize_descriptions(descriptions, SUMMARIZE_GRAPH_PROMPT)
+        return SummaryCache.fingerprint(content, prompt_version)
+
+    async def summarize_community(
+        self,
+        summarizer: CommunitySummarizer | None = None,
+        summary_cache: SummaryCache | None = None,
+    ) -> str:
+        """
+        Descriptions of large communities are summarized in token bounded
+        batches and reduced until one summary remains (see CommunitySummarizer).
+        With a summary cache, the summary is looked up by the community
+        fingerprint and the LLM is only called for communities that changed.
+        """
+        summarizer = summarizer or CommunitySummarizer.from_config(None)
+        fingerprint = None
+        if summary_cache is not None:
+            fingerprint = self.summary_fingerprint(summarizer.prompt_version)
+            summary = summary_cache.get(fingerprint)
+            if summary is not None:
+                return summary
+        summary = await summarizer.summarize(
+            [_description(vertex) for vertex in self.graph.vs],
+            [_description(edge) for edge in self.graph.es],
+        )
+        if summary_cache is not None:
+            summary_cache.set(fingerprint, summary)
+        return summary
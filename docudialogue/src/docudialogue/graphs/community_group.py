@@ -1,4 +1,8 @@
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import copy
+from typing import Iterable
+
 from igraph import Graph
 
 from docudialogue.graphs.community import Community
@@ -17,7 +21,13 @@ class CommunityGroup:
         communities: dict[int, Community],
         community_ids_ordered: list[int],
         neighbour_connections: dict[str, CommunityNeighbourConnections],
+        traverse: bool = True,
     ) -> None:
+        """
+        Orders the communities of the group and, if traverse is set, finds
+        the traversal through each of them. Otherwise the traversal can be
+        done later, e.g. in a worker process with traverse_groups_in_parallel.
+        """
         self.id = id
         self.parent_graph = parent_graph
         self.communities = communities
@@ -31,7 +41,26 @@ class CommunityGroup:
         )
         self.global_traversal, self.global_traversal_parents = [], []
         self.ordered_exits = defaultdict(list)
-        self._find_best_traversal_through_group()
+        if traverse:
+            self._find_best_traversal_through_group()
+
+    def detached(self) -> "CommunityGroup":
+        """Copy with detached communities, cheap to send to a worker process."""
+        group = copy.copy(self)
+        group.parent_graph = None
+        # Shared by all groups, the traversal only reads connections of each community
+        group.neighbour_connections = None
+        group.communities = {
+            community_id: community.detached()
+            for community_id, community in self.communities.items()
+        }
+        group.ordered_exits = defaultdict(list)
+        return group
+
+    def copy_traversal_from(self, other: "CommunityGroup") -> None:
+        for community_id, community in self.communities.items():
+            community.copy_traversal_from(other.communities[community_id])
+        self.ordered_exits = other.ordered_exits
 
     def _find_community_border_info(
         self,
@@ -159,3 +188,40 @@ class CommunityGroup:
                 community.traversal_order_parents[0] = self.global_traversal[-1]
             self.global_traversal_parents.extend(community.traversal_order_parents)
             self.global_traversal.extend(community.traversal_order)
+
+
+def _traverse_detached_group(group: CommunityGroup) -> CommunityGroup:
+    group._find_best_traversal_through_group()
+    return group
+
+
+def traverse_groups_in_parallel(
+    groups: Iterable[CommunityGroup], num_workers: int = 4, min_communities: int = 2
+) -> None:
+    """
+    Finds the traversal through groups created with traverse=False.
+    Groups are independent connected components, so groups with at least
+    min_communities communities are traversed in a process pool while
+    the smaller ones are traversed in this process in the meantime.
+    Results are copied back to the communities of each group.
+    """
+    groups = list(groups)
+    large_groups = [group for group in groups if len(group.communities) >= min_communities]
+    small_groups = [group for group in groups if len(group.communities) < min_communities]
+    if num_workers <= 1 or len(large_groups) < 2:
+        small_groups, large_groups = groups, []
+
+    if not large_groups:
+        for group in small_groups:
+            group._find_best_traversal_through_group()
+        return
+
+    with ProcessPoolExecutor(max_workers=min(num_workers, len(large_groups))) as executor:
+        futures = [
+            executor.submit(_traverse_detached_group, group.detached())
+            for group in large_groups
+        ]
+        for group in small_groups:
+            group._find_best_traversal_through_group()
+        for group, future in zip(large_groups, futures):
+            group.copy_traversal_from(future.result())
@@ -0,0 +1,194 @@
+import logging
+import time
+
+from docudialogue.graphs.summary_cache import SummaryCache
+from docudialogue.llm_wrappers.llm_cache import LLMResponseCache
+from docudialogue.llm_wrappers.llm_wrappers import LLMModel, create_llm_model
+from docudialogue.llm_wrappers.prompts import (
+    SUMMARIZE_GRAPH_PROMPT,
+    SUMMARIZE_PARTIAL_SUMMARIES_PROMPT,
+)
+from docudialogue.llm_wrappers.pydantic_classes import SummarizedDescription
+from docudialogue.llm_wrappers.rate_limiter import AdaptiveRateLimiter
+from docudialogue.utils import RetryPolicy, run_concurrent_stream
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Same rough estimate as the one used for rate limiting in LLMModel
+CHARACTERS_PER_TOKEN = 4
+
+# Kind of text in a batch, descriptions in map batches and partial summaries in reduce batches
+VERTEX, EDGE, SUMMARY = "vertex", "edge", "summary"
+
+
+class CommunitySummarizer:
+    """
+    Map-reduce summarization of community descriptions.
+    Vertex and edge descriptions are packed into batches of at most
+    max_batch_tokens and every batch is summarized with SUMMARIZE_GRAPH_PROMPT.
+    Partial summaries are then packed and reduced with
+    SUMMARIZE_PARTIAL_SUMMARIES_PROMPT, level by level, until one summary remains.
+    Requests of a level run concurrently, so latency grows with the number of
+    levels, which is logarithmic in the size of the community. A community that
+    fits into a single batch is summarized with one request, as before.
+    """
+
+    def __init__(
+        self,
+        model: LLMModel,
+        model_name: str = "gpt-4o-mini",
+        temperature: float = 0,
+        rate_limiter: AdaptiveRateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        max_concurrent: int = 20,
+        max_batch_tokens: int = 4000,
+    ) -> None:
+        # A single text can take at most half of a batch, so every reduce batch
+        # combines at least two summaries and the reduction always terminates
+        max_item_characters = (max_batch_tokens // 2 - 1) * CHARACTERS_PER_TOKEN
+        if max_item_characters < 1:
+            raise ValueError(
+                "max_batch_tokens must be at least 4 so that two texts of at least "
+                "one token each fit into every batch"
+            )
+        self.model = model
+        self.model_name = model_name
+        self.temperature = temperature
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.max_concurrent = max_concurrent
+        # Budget for the descriptions or summaries of one request, without the prompt itself
+        self.max_batch_tokens = max_batch_tokens
+        self.max_item_characters = max_item_characters
+        # The batch budget changes how a community is split, so it is part of the version
+        self.prompt_version = SummaryCache.prompt_version(
+            model_name,
+            SUMMARIZE_GRAPH_PROMPT,
+            SUMMARIZE_PARTIAL_SUMMARIES_PROMPT,
+            str(max_batch_tokens),
+        )
+        self.stats = {}
+
+    @classmethod
+    def from_config(
+        cls, config: dict | None, cache: LLMResponseCache | None = None
+    ) -> "CommunitySummarizer":
+        """Reads the "llm", "rate_limit", "retry" and "community_summarization" sections of the graph config."""
+        config = config or {}
+        llm_config = config.get("llm", {})
+        summarization_config = config.get("community_summarization", {})
+        return cls(
+            create_llm_model(llm_config, cache=cache),
+            model_name=llm_config.get("model_name", "gpt-4o-mini"),
+            temperature=llm_config.get("temperature", 0),
+            rate_limiter=AdaptiveRateLimiter.from_config(config.get("rate_limit")),
+            retry_policy=RetryPolicy.from_config(config.get("retry")),
+            max_concurrent=summarization_config.get("max_concurrent", 20),
+            max_batch_tokens=summarization_config.get("max_batch_tokens", 4000),
+        )
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return len(text) // CHARACTERS_PER_TOKEN + 1
+
+    def _pack(self, items: list[tuple[str, str]]) -> list[list[tuple[str, str]]]:
+        """Groups (kind, text) items into batches within the token budget, in order."""
+        batches, batch, batch_tokens = [], [], 0
+        for kind, text in items:
+            text = text[: self.max_item_characters]
+            num_tokens = self.estimate_tokens(text)
+            if batch and batch_tokens + num_tokens > self.max_batch_tokens:
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append((kind, text))
+            batch_tokens += num_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _map_prompt(self, batch: list[tuple[str, str]]) -> str:
+        descriptions = {
+            "vertex_descriptions": [text for kind, text in batch if kind == VERTEX],
+            "edge_descriptions": [text for kind, text in batch if kind == EDGE],
+        }
+        return SUMMARIZE_GRAPH_PROMPT.format(descriptions=descriptions)
+
+    def _reduce_prompt(self, batch: list[tuple[str, str]]) -> str:
+        return SUMMARIZE_PARTIAL_SUMMARIES_PROMPT.format(summaries=[text for _, text in batch])
+
+    async def _summarize_prompt(self, user_prompt: str) -> str:
+        response = await self.model.parse(
+            system_prompt="",
+            user_prompt=user_prompt,
+            response_format=SummarizedDescription,
+            model_name=self.model_name,
+            temperature=self.temperature,
+        )
+        return response.description
+
+    async def _run_level(self, prompts: list[str], fallbacks: list[str]) -> list[str]:
+        """Summarizes prompts concurrently and returns summaries in the same order.
+        A failed prompt is replaced by its fallback text."""
+        summaries = list(fallbacks)
+
+        async def keyed_funcs():
+            for prompt_idx, prompt in enumerate(prompts):
+                yield prompt_idx, lambda p=prompt: self._summarize_prompt(p)
+
+        async def on_result(prompt_idx: int, summary: str):
+            summaries[prompt_idx] = summary
+            self.stats["requests"] += 1
+
+        async def on_error(prompt_idx: int, error: BaseException):
+            logger.warning(f"Summarizing part of a community failed: {error}")
+            self.stats["requests"] += 1
+            self.stats["failed"] += 1
+
+        await run_concurrent_stream(
+            keyed_funcs(),
+            on_result,
+            on_error,
+            max_concurrent=self.max_concurrent,
+            rate_limiter=self.rate_limiter,
+            retry_policy=self.retry_policy,
+        )
+        return summaries
+
+    def _fallback(self, batch: list[tuple[str, str]]) -> str:
+        return " ".join(text for _, text in batch)[: self.max_item_characters]
+
+    async def summarize(
+        self, vertex_descriptions: list[str], edge_descriptions: list[str]
+    ) -> str:
+        """Returns a single summary of all vertex and edge descriptions."""
+        start = time.monotonic()
+        items = [(VERTEX, text) for text in vertex_descriptions] + [
+            (EDGE, text) for text in edge_descriptions
+        ]
+        self.stats = {"items": len(items), "levels": 0, "requests": 0, "failed": 0}
+        if not items:
+            self.stats["seconds"] = 0.0
+            return ""
+
+        batches = self._pack(items)
+        summaries = await self._run_level(
+            [self._map_prompt(batch) for batch in batches],
+            [self._fallback(batch) for batch in batches],
+        )
+        self.stats["levels"] = 1
+        while len(summaries) > 1:
+            batches = self._pack([(SUMMARY, summary) for summary in summaries])
+            summaries = await self._run_level(
+                [self._reduce_prompt(batch) for batch in batches],
+                [self._fallback(batch) for batch in batches],
+            )
+            self.stats["levels"] += 1
+
+        self.stats["seconds"] = time.monotonic() - start
+        if self.stats["levels"] > 1:
+            logger.info(
+                f"Summarized community of {len(items)} descriptions in {self.stats['levels']} levels "
+                f"with {self.stats['requests']} requests in {self.stats['seconds']:.1f}s"
+            )
+        return summaries[0]
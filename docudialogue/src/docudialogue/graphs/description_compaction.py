@@ -0,0 +1,197 @@
+import hashlib
+import logging
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+WORD_PATTERN = re.compile(r"\w+")
+MAX_NUM_PERMUTATIONS = 256
+# Multiply-shift hash functions for MinHash, seeded so signatures are the same in every process
+_hash_rng = np.random.default_rng(0)
+_HASH_MULTIPLIERS = _hash_rng.integers(1, 2**63, MAX_NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_HASH_OFFSETS = _hash_rng.integers(0, 2**63, MAX_NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def description_features(description: str) -> frozenset[str]:
+    """
+    Words and word bigrams of a description. Bigrams keep "A acquired B" and
+    "B acquired A" apart, words keep a single inserted word from making two
+    descriptions look unrelated. Case and punctuation are ignored.
+    A description without words has a single empty feature.
+    """
+    words = WORD_PATTERN.findall(description.lower())
+    bigrams = [f"{first} {second}" for first, second in zip(words, words[1:])]
+    return frozenset(words + bigrams) or frozenset([""])
+
+
+def jaccard(first: frozenset[str], second: frozenset[str]) -> float:
+    return len(first & second) / len(first | second)
+
+
+@lru_cache(maxsize=2**18)
+def _feature_hash(feature: str) -> int:
+    # blake2b instead of hash() so signatures are the same in every process
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash_signatures(feature_sets: list[frozenset[str]], num_permutations: int = 64) -> np.ndarray:
+    """
+    MinHash signature of every non empty feature set, shape (len(feature_sets), num_permutations).
+    The share of equal positions in two signatures estimates their Jaccard similarity.
+    Features of all sets are hashed in one pass.
+    """
+    hashes = np.fromiter(
+        (_feature_hash(feature) for feature_set in feature_sets for feature in feature_set),
+        dtype=np.uint64,
+    )
+    permuted = hashes[:, None] * _HASH_MULTIPLIERS[:num_permutations] + _HASH_OFFSETS[:num_permutations]
+    sizes = np.array([len(feature_set) for feature_set in feature_sets])
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    return np.minimum.reduceat(permuted, starts, axis=0)
+
+
+class DescriptionCompactor:
+    """
+    CPU-only compaction of description lists before LLM summarization.
+    1. Near duplicates, descriptions whose word and bigram Jaccard similarity is
+        at least near_duplicate_threshold, are collapsed into the longest one.
+        Candidate pairs come from MinHash LSH buckets (num_bands bands of the
+        signature), so long lists are not compared pair by pair.
+    2. From what is left, Maximal Marginal Relevance picks at most
+        max_descriptions descriptions within max_characters: each pick
+        maximizes mmr_lambda * relevance - (1 - mmr_lambda) * redundancy, where
+        relevance is how common the features of a description are in the list
+        and redundancy is the highest similarity to an already picked one.
+    Picked descriptions keep their original order. A list compacted to a single
+    description needs no LLM summary at all.
+    """
+
+    def __init__(
+        self,
+        max_descriptions: int = 5,
+        max_characters: int = 1500,
+        near_duplicate_threshold: float = 0.7,
+        mmr_lambda: float = 0.7,
+        num_permutations: int = 64,
+        num_bands: int = 16,
+    ) -> None:
+        if num_permutations > MAX_NUM_PERMUTATIONS or num_permutations % num_bands:
+            raise ValueError(
+                f"num_permutations must be at most {MAX_NUM_PERMUTATIONS} and divisible by num_bands"
+            )
+        self.max_descriptions = max_descriptions
+        self.max_characters = max_characters
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.mmr_lambda = mmr_lambda
+        self.num_permutations = num_permutations
+        self.num_bands = num_bands
+        self.stats = {
+            "lists": 0,
+            "descriptions_before": 0,
+            "descriptions_after": 0,
+            "near_duplicates": 0,
+            "single_after": 0,
+        }
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "DescriptionCompactor | None":
+        config = config or {}
+        if not config.get("enabled", False):
+            return None
+        return cls(
+            max_descriptions=config.get("max_descriptions", 5),
+            max_characters=config.get("max_characters", 1500),
+            near_duplicate_threshold=config.get("near_duplicate_threshold", 0.7),
+            mmr_lambda=config.get("mmr_lambda", 0.7),
+            num_permutations=config.get("num_permutations", 64),
+            num_bands=config.get("num_bands", 16),
+        )
+
+    def _remove_near_duplicates(
+        self, descriptions: list[str], feature_sets: list[frozenset[str]]
+    ) -> list[int]:
+        """Returns ids of descriptions to keep, the longest one of every near duplicate group."""
+        signatures = minhash_signatures(feature_sets, self.num_permutations)
+        # Rows of a band are combined into one key, equal bands give equal keys
+        bands = signatures.reshape(len(descriptions), self.num_bands, -1)
+        band_keys = (bands * _HASH_MULTIPLIERS[: bands.shape[2]]).sum(axis=2).tolist()
+        buckets = [defaultdict(list) for _ in range(self.num_bands)]
+        kept = []
+        for description_id in sorted(
+            range(len(descriptions)), key=lambda idx: len(descriptions[idx]), reverse=True
+        ):
+            candidates = {
+                kept_id
+                for band_id, key in enumerate(band_keys[description_id])
+                for kept_id in buckets[band_id].get(key, ())
+            }
+            if any(
+                jaccard(feature_sets[description_id], feature_sets[kept_id])
+                >= self.near_duplicate_threshold
+                for kept_id in candidates
+            ):
+                continue
+            kept.append(description_id)
+            for band_id, key in enumerate(band_keys[description_id]):
+                buckets[band_id][key].append(description_id)
+        return kept
+
+    def _select(
+        self, descriptions: list[str], feature_sets: list[frozenset[str]], candidate_ids: list[int]
+    ) -> list[int]:
+        document_frequency = Counter(
+            feature for idx in candidate_ids for feature in feature_sets[idx]
+        )
+        relevance = {
+            idx: sum(document_frequency[feature] for feature in feature_sets[idx])
+            / (len(feature_sets[idx]) * len(candidate_ids))
+            for idx in candidate_ids
+        }
+        # Highest similarity to any selected description, updated after every pick
+        redundancy = dict.fromkeys(candidate_ids, 0.0)
+        selected, num_characters = [], 0
+        while redundancy and len(selected) < self.max_descriptions:
+            best_id = max(
+                redundancy,
+                key=lambda idx: (
+                    self.mmr_lambda * relevance[idx] - (1 - self.mmr_lambda) * redundancy[idx],
+                    -idx,
+                ),
+            )
+            del redundancy[best_id]
+            # The first pick is always kept, others only if they fit into the budget
+            if selected and num_characters + len(descriptions[best_id]) > self.max_characters:
+                continue
+            selected.append(best_id)
+            num_characters += len(descriptions[best_id])
+            for idx in redundancy:
+                redundancy[idx] = max(
+                    redundancy[idx], jaccard(feature_sets[idx], feature_sets[best_id])
+                )
+        return selected
+
+    def compact(self, descriptions: list[str]) -> list[str]:
+        """Returns a small and diverse subset of descriptions, in their original order."""
+        self.stats["lists"] += 1
+        self.stats["descriptions_before"] += len(descriptions)
+        if len(descriptions) > 1:
+            feature_sets = [description_features(description) for description in descriptions]
+            kept = self._remove_near_duplicates(descriptions, feature_sets)
+            self.stats["near_duplicates"] += len(descriptions) - len(kept)
+            selected = self._select(descriptions, feature_sets, kept)
+            descriptions = [descriptions[idx] for idx in sorted(selected)]
+        self.stats["descriptions_after"] += len(descriptions)
+        self.stats["single_after"] += len(descriptions) == 1
+        return descriptions
+
+    def log_stats(self) -> None:
+        logger.info(
+            f"Compacted {self.stats['lists']} description lists from {self.stats['descriptions_before']} "
+            f"to {self.stats['descriptions_after']} descriptions ({self.stats['near_duplicates']} near duplicates), "
+            f"{self.stats['single_after']} lists need no summary"
+        )
@@ -0,0 +1,298 @@
+import logging
+import time
+
+from igraph import Graph
+
+from docudialogue.graphs.summary_cache import SummaryCache
+
+from docudialogue.llm_wrappers.llm_cache import LLMResponseCache
+from docudialogue.llm_wrappers.llm_wrappers import LLMModel, create_llm_model
+from docudialogue.llm_wrappers.prompts import (
+    SUMMARIZE_DESCRIPTIONS_BATCH_PROMPT,
+    SUMMARIZE_DESCRIPTIONS_PROMPT,
+)
+from docudialogue.llm_wrappers.pydantic_classes import (
+    SummarizedDescription,
+    SummarizedDescriptions,
+)
+from docudialogue.llm_wrappers.rate_limiter import AdaptiveRateLimiter
+from docudialogue.utils import RetryPolicy, run_concurrent_stream
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DescriptionSet = tuple[str, ...]
+
+
+class DescriptionSummarizer:
+    """
+    Summarizes description lists of graph vertices and edges into a single
+    description each, with at most max_concurrent LLM requests in flight.
+    Lists with a single description are kept as they are without any request
+    and identical description sets are summarized only once.
+    Short lists are packed, up to batch_size at a time, into one structured
+    request that returns a summary per list. Lists missing from its response
+    are summarized again on their own.
+    With a summary cache, description sets summarized in a previous run (same
+    sorted descriptions, model and prompts) are taken from it without a request.
+    """
+
+    def __init__(
+        self,
+        model: LLMModel,
+        model_name: str = "gpt-4o-mini",
+        temperature: float = 0,
+        rate_limiter: AdaptiveRateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        max_concurrent: int = 20,
+        batch_size: int = 8,
+        max_item_characters: int = 1000,
+        max_batch_characters: int = 6000,
+        progress_interval: float = 10.0,
+        summary_cache: SummaryCache | None = None,
+    ) -> None:
+        self.model = model
+        self.model_name = model_name
+        self.temperature = temperature
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.max_concurrent = max_concurrent
+        self.batch_size = batch_size
+        # Lists longer than this always get a request of their own
+        self.max_item_characters = max_item_characters
+        self.max_batch_characters = max_batch_characters
+        self.progress_interval = progress_interval
+        self.summary_cache = summary_cache
+        # Changing the model or the prompts invalidates cached summaries
+        self.prompt_version = SummaryCache.prompt_version(
+            model_name, SUMMARIZE_DESCRIPTIONS_PROMPT, SUMMARIZE_DESCRIPTIONS_BATCH_PROMPT
+        )
+        self.stats = {}
+        self._failed: set[DescriptionSet] = set()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict | None,
+        cache: LLMResponseCache | None = None,
+        summary_cache: SummaryCache | None = None,
+    ) -> "DescriptionSummarizer":
+        """Reads the "llm", "rate_limit", "retry" and "summarization" sections of the graph config."""
+        config = config or {}
+        llm_config = config.get("llm", {})
+        summarization_config = config.get("summarization", {})
+        return cls(
+            create_llm_model(llm_config, cache=cache),
+            model_name=llm_config.get("model_name", "gpt-4o-mini"),
+            temperature=llm_config.get("temperature", 0),
+            rate_limiter=AdaptiveRateLimiter.from_config(config.get("rate_limit")),
+            retry_policy=RetryPolicy.from_config(config.get("retry")),
+            max_concurrent=summarization_config.get("max_concurrent", 20),
+            batch_size=summarization_config.get("batch_size", 8),
+            max_item_characters=summarization_config.get("max_item_characters", 1000),
+            max_batch_characters=summarization_config.get("max_batch_characters", 6000),
+            progress_interval=summarization_config.get("progress_interval_seconds", 10.0),
+            summary_cache=summary_cache,
+        )
+
+    @staticmethod
+    def description_set(descriptions: list[str]) -> DescriptionSet:
+        return tuple(sorted(set(descriptions)))
+
+    def fingerprint(self, description_set: DescriptionSet) -> str:
+        return SummaryCache.fingerprint(list(description_set), self.prompt_version)
+
+    def _load_cached(
+        self, description_sets: list[DescriptionSet], summaries: dict[DescriptionSet, str]
+    ) -> list[DescriptionSet]:
+        """Fills summaries from the summary cache and returns description sets not in it."""
+        if self.summary_cache is None:
+            return description_sets
+        fingerprints = {
+            description_set: self.fingerprint(description_set)
+            for description_set in description_sets
+        }
+        cached = self.summary_cache.get_many(fingerprints.values())
+        not_cached = []
+        for description_set, fingerprint in fingerprints.items():
+            if fingerprint in cached:
+                summaries[description_set] = cached[fingerprint]
+            else:
+                not_cached.append(description_set)
+        return not_cached
+
+    def _store_cached(
+        self, description_sets: list[DescriptionSet], summaries: dict[DescriptionSet, str]
+    ) -> None:
+        """Stores new summaries, failed description sets are not cached."""
+        if self.summary_cache is None:
+            return
+        self.summary_cache.set_many(
+            {
+                self.fingerprint(description_set): summaries[description_set]
+                for description_set in description_sets
+                if description_set not in self._failed
+            }
+        )
+
+    def _pack(self, description_sets: list[DescriptionSet]) -> list[list[DescriptionSet]]:
+        """Groups short description sets into batches, long ones stay alone."""
+        batches, batch, batch_characters = [], [], 0
+        for description_set in description_sets:
+            num_characters = sum(len(description) for description in description_set)
+            if self.batch_size <= 1 or num_characters > self.max_item_characters:
+                batches.append([description_set])
+                continue
+            if batch and (
+                len(batch) == self.batch_size
+                or batch_characters + num_characters > self.max_batch_characters
+            ):
+                batches.append(batch)
+                batch, batch_characters = [], 0
+            batch.append(description_set)
+            batch_characters += num_characters
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _summarize_batch(
+        self, batch: list[DescriptionSet]
+    ) -> dict[DescriptionSet, str]:
+        if len(batch) == 1:
+            response = await self.model.parse(
+                system_prompt="",
+                user_prompt=SUMMARIZE_DESCRIPTIONS_PROMPT.format(descriptions=list(batch[0])),
+                response_format=SummarizedDescription,
+                model_name=self.model_name,
+                temperature=self.temperature,
+            )
+            return {batch[0]: response.description}
+        description_lists = "\n".join(
+            f"Item {item_id}: {list(description_set)}"
+            for item_id, description_set in enumerate(batch)
+        )
+        response = await self.model.parse(
+            system_prompt="",
+            user_prompt=SUMMARIZE_DESCRIPTIONS_BATCH_PROMPT.format(
+                description_lists=description_lists
+            ),
+            response_format=SummarizedDescriptions,
+            model_name=self.model_name,
+            temperature=self.temperature,
+        )
+        summaries = {summary.id: summary.description for summary in response.summaries}
+        return {
+            description_set: summaries[item_id]
+            for item_id, description_set in enumerate(batch)
+            if item_id in summaries
+        }
+
+    async def _run_batches(
+        self,
+        batches: list[list[DescriptionSet]],
+        summaries: dict[DescriptionSet, str],
+        num_total: int,
+        start: float,
+    ) -> list[DescriptionSet]:
+        """Runs the batches concurrently and returns description sets left without summary."""
+        missing, failed = [], []
+        last_report = time.monotonic()
+
+        async def keyed_funcs():
+            for batch_idx, batch in enumerate(batches):
+                yield batch_idx, lambda b=batch: self._summarize_batch(b)
+
+        async def on_result(batch_idx: int, batch_summaries: dict[DescriptionSet, str]):
+            nonlocal last_report
+            summaries.update(batch_summaries)
+            missing.extend(
+                description_set
+                for description_set in batches[batch_idx]
+                if description_set not in batch_summaries
+            )
+            self.stats["requests"] += 1
+            if time.monotonic() - last_report >= self.progress_interval:
+                last_report = time.monotonic()
+                self._log_progress(len(summaries), num_total, start)
+
+        async def on_error(batch_idx: int, error: BaseException):
+            failed.extend(batches[batch_idx])
+            self.stats["requests"] += 1
+
+        await run_concurrent_stream(
+            keyed_funcs(),
+            on_result,
+            on_error,
+            max_concurrent=self.max_concurrent,
+            rate_limiter=self.rate_limiter,
+            retry_policy=self.retry_policy,
+        )
+        # Failed description sets keep their descriptions joined together
+        for description_set in failed:
+            summaries[description_set] = " ".join(description_set)
+        self.stats["failed"] += len(failed)
+        self._failed.update(failed)
+        return missing
+
+    def _log_progress(self, num_done: int, num_total: int, start: float) -> None:
+        elapsed = time.monotonic() - start
+        logger.info(
+            f"Summarized {num_done}/{num_total} description sets in {elapsed:.1f}s "
+            f"({num_done / max(elapsed, 1e-9):.1f} sets/s, {self.stats['requests']} requests)"
+        )
+
+    async def summarize(self, description_lists: list[list[str]]) -> list[str]:
+        """Returns one description for each description list, in the same order."""
+        start = time.monotonic()
+        description_sets = [self.description_set(descriptions) for descriptions in description_lists]
+        unique_sets = list(dict.fromkeys(description_sets))
+        summaries: dict[DescriptionSet, str] = {}
+        multiple = []
+        for description_set in unique_sets:
+            if len(description_set) <= 1:
+                summaries[description_set] = description_set[0] if description_set else ""
+            else:
+                multiple.append(description_set)
+        # Only description sets whose fingerprint is not in the cache go to the LLM
+        to_summarize = self._load_cached(multiple, summaries)
+        batches = self._pack(to_summarize)
+        self._failed = set()
+        self.stats = {
+            "items": len(description_lists),
+            "single": len(unique_sets) - len(multiple),
+            "duplicates": len(description_sets) - len(unique_sets),
+            "cached": len(multiple) - len(to_summarize),
+            "summarized": len(to_summarize),
+            "batched_requests": sum(len(batch) > 1 for batch in batches),
+            "requests": 0,
+            "missing_from_batches": 0,
+            "failed": 0,
+        }
+        num_total = len(unique_sets)
+
+        missing = await self._run_batches(batches, summaries, num_total, start)
+        if missing:
+            self.stats["missing_from_batches"] = len(missing)
+            logger.info(f"{len(missing)} description sets were missing from batch responses, retrying one by one")
+            await self._run_batches(
+                [[description_set] for description_set in missing], summaries, num_total, start
+            )
+
+        self._store_cached(to_summarize, summaries)
+        self.stats["seconds"] = time.monotonic() - start
+        logger.info(
+            f"Summarized {len(to_summarize)} description sets with {self.stats['requests']} requests "
+            f"in {self.stats['seconds']:.1f}s ({len(to_summarize) / max(self.stats['seconds'], 1e-9):.1f} sets/s). "
+            f"Skipped {self.stats['single']} single descriptions, {self.stats['duplicates']} duplicates "
+            f"and {self.stats['cached']} cached, "
+            f"{self.stats['failed']} failed."
+        )
+        if self.rate_limiter is not None:
+            logger.info(f"Summarization rate limiter stats: {self.rate_limiter.stats()}")
+        return [summaries[description_set] for description_set in description_sets]
+
+    async def summarize_graph(self, graph: Graph) -> None:
+        """Sets the "desc" attribute of every vertex and edge from its "descriptions"."""
+        summaries = await self.summarize(graph.vs["descriptions"] + graph.es["descriptions"])
+        graph.vs["desc"] = summaries[: graph.vcount()]
+        graph.es["desc"] = summaries[graph.vcount() :]
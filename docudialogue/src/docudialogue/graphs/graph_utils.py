@@ -1,14 +1,24 @@
 from __future__ import annotations
 from collections import defaultdict
+from collections.abc import Callable, Mapping
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+import logging
 import os
+import random
+import time
 from igraph import Graph
-from leidenalg import ModularityVertexPartition
-import networkx
+from leidenalg import ModularityVertexPartition, find_partition
+import numpy as np
+from scipy import sparse
+import scipy.sparse.linalg
 
-from docudialogue.llm_wrappers.llm_wrappers import OpenAIModel
+from docudialogue.llm_wrappers.llm_wrappers import LLMModel, OpenAIModel
 from docudialogue.llm_wrappers.pydantic_classes import SummarizedDescription
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
 
 class CommunityNeighbourConnections:
     def __init__(self, community_id: int):
@@ -49,94 +59,164 @@ class OrderType(Enum):
     FROM_ENDS = "FRONT_ENDS"
 
 
-async def summarize_descriptions(descriptions: list[str] | dict, prompt: str) -> str:
+async def summarize_descriptions(
+    descriptions: list[str] | dict, prompt: str, model: LLMModel | None = None
+) -> str:
     if isinstance(descriptions, list) and len(descriptions) == 1:
         return descriptions[0]
     else:
-        model = OpenAIModel(os.environ["LLM_API_KEY"])
-        return await model.parse(
+        model = model or OpenAIModel(os.environ["LLM_API_KEY"])
+        response = await model.parse(
             system_prompt="",
             user_prompt=prompt.format(descriptions=descriptions),
             response_format=SummarizedDescription,
             model_name="gpt-4o-mini",
             temperature=0,
-        ).description
-
-
-def _find_neighbour_connections(
-    community_id: int, graph: Graph, partition: ModularityVertexPartition
-) -> CommunityNeighbourConnections:
-    """Finds all connections between communities in the graph."""
-    outside_connections = CommunityNeighbourConnections(community_id)
-    for edge_id, crossing_exists in enumerate(partition.crossing()):
-        if crossing_exists:
-            node1, node2 = graph.es[edge_id].tuple
-            node1_in_curr_community = partition.membership[node1] == community_id
-            node2_in_curr_community = partition.membership[node2] == community_id
-
-            if node1_in_curr_community or node2_in_curr_community:
-                if node1_in_curr_community:
-                    curr_community_node = node1
-                    neighbor_community_node = node2
-                else:
-                    curr_community_node = node2
-                    neighbor_community_node = node1
-
-                neighbour_community_id = partition.membership[neighbor_community_node]
-
-                connection = (curr_community_node, edge_id, neighbor_community_node)
-                outside_connections.add_connection(neighbour_community_id, connection)
-    return outside_connections
+        )
+        return response.description
 
 
 def find_neighbour_connections(
     graph: Graph, partition: ModularityVertexPartition
-) -> dict[str, CommunityNeighbourConnections]:
+) -> dict[int, CommunityNeighbourConnections]:
     """
     Finds all connections between communities in the graph.
     Returns a dictionary where keys are community IDs and values
     are lists of connections.
+    Crossing edges are found in one pass over the edge list and each one is
+    added to the communities of both of its ends, in order of edge ids.
     """
-    outside_connections = {}
-    for community_id in range(len(partition.subgraphs())):
-        outside_connections[community_id] = _find_neighbour_connections(
-            community_id, graph, partition
-        )
+    membership = np.asarray(partition.membership, dtype=np.int64)
+    edges = np.asarray(graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    crossing_edge_ids = np.flatnonzero(membership[edges[:, 0]] != membership[edges[:, 1]])
+    nodes1, nodes2 = edges[crossing_edge_ids, 0], edges[crossing_edge_ids, 1]
+
+    outside_connections = {
+        community_id: CommunityNeighbourConnections(community_id)
+        for community_id in range(len(partition))
+    }
+    for edge_id, node1, node2, community1, community2 in zip(
+        crossing_edge_ids.tolist(),
+        nodes1.tolist(),
+        nodes2.tolist(),
+        membership[nodes1].tolist(),
+        membership[nodes2].tolist(),
+    ):
+        outside_connections[community1].add_connection(community2, (node1, edge_id, node2))
+        outside_connections[community2].add_connection(community1, (node2, edge_id, node1))
     return outside_connections
 
 
-def map_nodes_between_graphs(
-    parent_graph: Graph, child_graph: Graph
-) -> dict[str, dict[str, str]]:
+def _leiden_run(graph: Graph, seed: int | None) -> tuple[list[int], float]:
+    partition = find_partition(graph, ModularityVertexPartition, seed=seed)
+    return partition.membership, partition.quality()
+
+
+def find_best_partition(
+    graph: Graph, num_runs: int = 1, seed: int | None = None, num_workers: int = 1
+) -> ModularityVertexPartition:
     """
-    Maps nodes, both ways, between the parent graph and child graph (subgraph).
+    Runs the Leiden algorithm num_runs times, each from a different random
+    initialization, and returns the partition with the highest modularity.
+    Run i is seeded with seed + i, so the result is reproducible given a seed.
+    With num_workers > 1 the runs are spread over a process pool.
+    """
+    if seed is None:
+        seed = random.randrange(2**31 - num_runs)
+    seeds = [seed + run for run in range(num_runs)]
+    if num_workers > 1 and num_runs > 1:
+        # Attributes are not used by Leiden and can be large
+        structure = Graph(n=graph.vcount(), edges=graph.get_edgelist())
+        with ProcessPoolExecutor(max_workers=min(num_workers, num_runs)) as executor:
+            results = list(executor.map(_leiden_run, [structure] * num_runs, seeds))
+    else:
+        results = [_leiden_run(graph, run_seed) for run_seed in seeds]
+    # First run wins ties, so the result does not depend on scheduling
+    membership, _ = max(results, key=lambda result: result[1])
+    return ModularityVertexPartition(graph, initial_membership=membership)
+
+
+class NodeMapping:
+    """
+    Maps node ids, both ways, between a parent graph and a child graph (subgraph).
     This is useful for traversing between 2 subgraphs and finding the connections between them via parent graph.
+    Child node i is parent node child_to_parent[i], stored as an integer array.
+    The inverse lookup is built on first use and is not pickled.
+    mapping["parent_to_child"] and mapping["child_to_parent"] give dict-like views.
     """
-    mapping = {
-        "parent_to_child": _map_parent_to_child_graph_nodes(parent_graph, child_graph),
-        "child_to_parent": _map_child_to_parent_graph_nodes(parent_graph, child_graph),
-    }
-    return mapping
 
+    def __init__(self, parent_node_ids: list[int]) -> None:
+        self._child_to_parent = np.asarray(parent_node_ids, dtype=np.int64)
+        self._parent_to_child = None
+
+    @classmethod
+    def from_graphs(cls, parent_graph: Graph, child_graph: Graph) -> "NodeMapping":
+        """Matches nodes by name, for subgraphs whose node order is not known."""
+        parent_ids_by_name = {name: idx for idx, name in enumerate(parent_graph.vs["name"])}
+        return cls([parent_ids_by_name[name] for name in child_graph.vs["name"]])
 
-def _map_parent_to_child_graph_nodes(
-    parent_graph: Graph, child_graph: Graph
-) -> dict[str, str]:
-    mapping = {}
-    for child_node in child_graph.vs:
-        node_id_in_parent = parent_graph.vs.find(child_node["name"]).index
-        mapping[node_id_in_parent] = child_node.index
-    return mapping
+    def __getstate__(self) -> dict:
+        # A list of ints pickles smaller than an array for small communities
+        return {"child_to_parent": self._child_to_parent.tolist()}
 
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["child_to_parent"])
 
-def _map_child_to_parent_graph_nodes(
-    parent_graph: Graph, child_graph: Graph
-) -> dict[str, str]:
-    mapping = {}
-    for node in child_graph.vs:
-        node_id_in_parent = parent_graph.vs.find(node["name"]).index
-        mapping[node.index] = node_id_in_parent
-    return mapping
+    def __len__(self) -> int:
+        return len(self._child_to_parent)
+
+    def __getitem__(self, direction: str) -> Mapping[int, int]:
+        if direction == "parent_to_child":
+            return self.parent_to_child
+        if direction == "child_to_parent":
+            return self.child_to_parent
+        raise KeyError(direction)
+
+    def get(self, direction: str, default=None):
+        try:
+            return self[direction]
+        except KeyError:
+            return default
+
+    @property
+    def parent_to_child(self) -> Mapping[int, int]:
+        if self._parent_to_child is None:
+            self._parent_to_child = {
+                parent_id: child_id
+                for child_id, parent_id in enumerate(self._child_to_parent.tolist())
+            }
+        return self._parent_to_child
+
+    @property
+    def child_to_parent(self) -> Mapping[int, int]:
+        return _ChildToParentView(self._child_to_parent)
+
+    def to_parent(self, child_node_ids: list[int]) -> list[int]:
+        return self._child_to_parent[child_node_ids].tolist()
+
+
+class _ChildToParentView(Mapping):
+    def __init__(self, child_to_parent: np.ndarray) -> None:
+        self._child_to_parent = child_to_parent
+
+    def __getitem__(self, child_id: int) -> int:
+        if not 0 <= child_id < len(self._child_to_parent):
+            raise KeyError(child_id)
+        return int(self._child_to_parent[child_id])
+
+    def __iter__(self):
+        return iter(range(len(self._child_to_parent)))
+
+    def __len__(self) -> int:
+        return len(self._child_to_parent)
+
+
+def map_nodes_between_graphs(parent_graph: Graph, child_graph: Graph) -> NodeMapping:
+    """
+    Maps nodes, both ways, between the parent graph and child graph (subgraph).
+    This is useful for traversing between 2 subgraphs and finding the connections between them via parent graph.
+    """
+    return NodeMapping.from_graphs(parent_graph, child_graph)
 
 
 def order_list(length: int, order: OrderType) -> list[int]:
@@ -155,20 +235,95 @@ def order_list(length: int, order: OrderType) -> list[int]:
         raise NotImplementedError()
 
 
-def order_nodes_by_centralization(graph: Graph) -> list[int]:
+def _simple_adjacency(graph: Graph) -> sparse.csr_matrix:
+    """Symmetric 0/1 adjacency matrix; parallel edges count once, self-loops are kept."""
+    num_nodes = graph.vcount()
+    edges = np.asarray(graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    rows = np.concatenate([edges[:, 0], edges[:, 1]])
+    cols = np.concatenate([edges[:, 1], edges[:, 0]])
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(num_nodes, num_nodes)
+    )
+    adjacency.data[:] = 1.0
+    return adjacency
+
+
+def _largest_eigenvalue(adjacency: sparse.csr_matrix) -> float:
+    # eigsh needs more nodes than requested eigenvalues, small graphs are solved densely
+    if adjacency.shape[0] <= 64:
+        return float(np.linalg.eigvalsh(adjacency.toarray())[-1])
+    return float(sparse.linalg.eigsh(adjacency, k=1, which="LA")[0][0])
+
+
+def katz_centrality(
+    graph: Graph,
+    alpha: float = 0.1,
+    beta: float = 1.0,
+    tolerance: float = 1e-6,
+    max_iterations: int = 1000,
+) -> np.ndarray:
     """
-    Order nodes by their Katz centrality in the graph.
-    The nodes with the most centrality are ordered first.
+    Katz centrality x = alpha * A x + beta by power iteration on a sparse
+    adjacency matrix, normalized to unit length.
+    The series only converges for alpha below 1 / largest eigenvalue of A,
+    larger values are lowered to 0.9 of that bound.
+    The iteration starts from the first two terms of the series,
+    beta * (1 + alpha * degree).
+    Iteration stops once the total change is below tolerance per node.
     """
-    graph_networkx = networkx.Graph()
-    graph_networkx.add_edges_from(graph.get_edgelist())
-    for vertex in graph.vs:
-        graph_networkx.nodes[vertex.index].update(vertex.attributes())
-    katz_centrality = networkx.katz_centrality(graph_networkx, alpha=0.1, beta=1.0)
-    least_centralized_order = sorted(
-        katz_centrality, key=katz_centrality.get, reverse=False
-    )
-    return least_centralized_order
+    num_nodes = graph.vcount()
+    if num_nodes == 0:
+        return np.zeros(0)
+    adjacency = _simple_adjacency(graph)
+    if adjacency.nnz:
+        largest_eigenvalue = _largest_eigenvalue(adjacency)
+        if alpha * largest_eigenvalue >= 1:
+            alpha_bound = 0.9 / largest_eigenvalue
+            logger.info(
+                f"Katz alpha {alpha} lowered to {alpha_bound:.4g}, "
+                f"largest eigenvalue is {largest_eigenvalue:.4g}"
+            )
+            alpha = alpha_bound
+
+    x = beta * (1 + alpha * np.asarray(adjacency.sum(axis=1)).ravel())
+    for _ in range(max_iterations):
+        x_last = x
+        x = alpha * (adjacency @ x_last) + beta
+        if np.abs(x - x_last).sum() < num_nodes * tolerance:
+            break
+    else:
+        logger.warning(f"Katz centrality did not converge in {max_iterations} iterations")
+    return x / np.linalg.norm(x)
+
+
+CENTRALITY_MEASURES = {
+    "katz": katz_centrality,
+    "pagerank": lambda graph, **kwargs: np.asarray(graph.pagerank(**kwargs)),
+    "eigenvector": lambda graph, **kwargs: np.asarray(graph.eigenvector_centrality(**kwargs)),
+    "degree": lambda graph, **kwargs: np.asarray(graph.degree(**kwargs), dtype=float),
+}
+
+
+def order_nodes_by_centralization(
+    graph: Graph, measure: str = "katz", **measure_options
+) -> list[int]:
+    """
+    Order nodes by their centrality in the graph, Katz centrality by default.
+    The least central nodes are ordered first, ties by node id.
+    measure_options are passed to the CENTRALITY_MEASURES function of measure.
+    """
+    if measure not in CENTRALITY_MEASURES:
+        raise ValueError(
+            f"Unknown centrality measure {measure}, expected one of {list(CENTRALITY_MEASURES)}"
+        )
+    try:
+        centrality = CENTRALITY_MEASURES[measure](graph, **measure_options)
+    except TypeError as e:
+        raise ValueError(
+            f"Invalid options {sorted(measure_options)} for centrality measure {measure}: {e}"
+        ) from e
+    least_centralized_order = np.argsort(centrality, kind="stable")
+    return least_centralized_order.tolist()
 
 
 def order_group_nodes_for_traversal(
@@ -198,141 +353,522 @@ def _find_starter_node_in_group(
     return starter_node_id
 
 
+class SearchBudget:
+    """
+    Limits how long modified_dfs may backtrack. The budget is spent by every node
+    the search enters and can be shared by several searches, e.g. one per entry node.
+    should_stop is polled together with the clock and ends the search early when
+    it returns True, e.g. once another search of a portfolio has found a path.
+    """
+
+    # Clock is only read every this many expansions
+    TIME_CHECK_INTERVAL = 256
+
+    def __init__(
+        self,
+        max_expansions: int | None = None,
+        time_budget: float | None = None,
+        should_stop: Callable[[], bool] | None = None,
+    ) -> None:
+        self.max_expansions = max_expansions
+        self.time_budget = time_budget
+        self.should_stop = should_stop
+        self.expansions = 0
+        self.exhausted = False
+        self._deadline = None
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "SearchBudget":
+        config = config or {}
+        return cls(
+            max_expansions=config.get("max_expansions", 200_000),
+            time_budget=config.get("time_budget_seconds", 5.0),
+        )
+
+    def start(self) -> "SearchBudget":
+        self.expansions = 0
+        self.exhausted = False
+        if self.time_budget is not None:
+            self._deadline = time.monotonic() + self.time_budget
+        return self
+
+    def spend(self) -> bool:
+        """Count one expansion and return True if the budget is exhausted."""
+        self.expansions += 1
+        if self.max_expansions is not None and self.expansions > self.max_expansions:
+            self.exhausted = True
+        elif self.expansions % self.TIME_CHECK_INTERVAL == 0 and (
+            (self._deadline is not None and time.monotonic() > self._deadline)
+            or (self.should_stop is not None and self.should_stop())
+        ):
+            self.exhausted = True
+        return self.exhausted
+
+
+def neighbors_csr(graph: Graph) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compact CSR adjacency of the graph: neighbors of node i are
+    indices[indptr[i]:indptr[i + 1]], in the same order as graph.neighbors(i).
+    """
+    adjacency = graph.get_adjlist()
+    indptr = np.zeros(len(adjacency) + 1, dtype=np.int64)
+    np.cumsum([len(neighbors) for neighbors in adjacency], out=indptr[1:])
+    indices = np.fromiter(
+        (neighbor for neighbors in adjacency for neighbor in neighbors),
+        dtype=np.int64,
+        count=int(indptr[-1]),
+    )
+    return indptr, indices
+
+
+class NeighborOrdering:
+    """
+    Decides in which order modified_dfs tries the neighbors of a node, within each
+    of its neighbor groups. This base ordering keeps the igraph adjacency order.
+    An ordering is created for every search with the graph and its end nodes.
+    """
+
+    # Set to True if order reads unvisited_degree, which then has to be maintained
+    uses_unvisited_degree = False
+
+    def __init__(self, graph: Graph, end_ids: list[int]) -> None:
+        pass
+
+    def order(self, neighbors: list[int], unvisited_degree: list[int]) -> list[int]:
+        return neighbors
+
+
+class MinDegreeOrdering(NeighborOrdering):
+    """Neighbors with the fewest neighbors in the whole graph first."""
+
+    def __init__(self, graph: Graph, end_ids: list[int]) -> None:
+        self._degree = graph.degree()
+
+    def order(self, neighbors: list[int], unvisited_degree: list[int]) -> list[int]:
+        return sorted(neighbors, key=self._degree.__getitem__)
+
+
+class WarnsdorffOrdering(NeighborOrdering):
+    """
+    Warnsdorff's rule: neighbors with the fewest unvisited neighbors first, as they
+    are the most likely to become dead ends later. Ties go to neighbors farther
+    from the end border, so the walk reaches the end nodes last.
+    """
+
+    uses_unvisited_degree = True
+
+    def __init__(self, graph: Graph, end_ids: list[int]) -> None:
+        if end_ids:
+            distances = np.asarray(graph.distances(source=end_ids), dtype=float).min(axis=0)
+            # Nodes that can not reach the end border are explored first
+            distances[np.isinf(distances)] = graph.vcount()
+            self._distance_to_end = distances.astype(np.int64).tolist()
+        else:
+            self._distance_to_end = [0] * graph.vcount()
+
+    def order(self, neighbors: list[int], unvisited_degree: list[int]) -> list[int]:
+        distance_to_end = self._distance_to_end
+        return sorted(
+            neighbors,
+            key=lambda neighbor: (unvisited_degree[neighbor], -distance_to_end[neighbor]),
+        )
+
+
+def node_blocks(graph: Graph) -> list[list[int]]:
+    """Ids of the biconnected components (blocks) every node belongs to."""
+    blocks = [[] for _ in range(graph.vcount())]
+    for block_id, block in enumerate(graph.biconnected_components()):
+        for node_id in block:
+            blocks[node_id].append(block_id)
+    return blocks
+
+
+def common_block(blocks: list[list[int]], node_id: int, neighbor: int) -> int:
+    """Block of the edge between two adjacent nodes. Two blocks share at most one node."""
+    node_blocks, neighbor_blocks = blocks[node_id], blocks[neighbor]
+    if len(node_blocks) == 1:
+        return node_blocks[0]
+    if len(neighbor_blocks) == 1:
+        return neighbor_blocks[0]
+    return next(block_id for block_id in node_blocks if block_id in neighbor_blocks)
+
+
+class _FenwickTree:
+    """Prefix sums over a fixed number of positions with O(log n) updates."""
+
+    def __init__(self, size: int) -> None:
+        self._tree = [0] * (size + 1)
+
+    def add(self, position: int, delta: int) -> None:
+        position += 1
+        while position < len(self._tree):
+            self._tree[position] += delta
+            position += position & -position
+
+    def prefix_sum(self, end: int) -> int:
+        total = 0
+        while end > 0:
+            total += self._tree[end]
+            end -= end & -end
+        return total
+
+    def range_sum(self, start: int, end: int) -> int:
+        return self.prefix_sum(end) - self.prefix_sum(start)
+
+
+NEIGHBOR_ORDERINGS: dict[str, type[NeighborOrdering]] = {
+    "adjacency": NeighborOrdering,
+    "min_degree": MinDegreeOrdering,
+    "warnsdorff": WarnsdorffOrdering,
+}
+DEFAULT_NEIGHBOR_ORDERING = "warnsdorff"
+
+
 def modified_dfs(
     graph: Graph,
     entry_node_id: int,
     mid_borders: list[LocalBorderNodes],
     last_border: LocalBorderNodes,
+    budget: SearchBudget | None = None,
+    neighbor_ordering: str = DEFAULT_NEIGHBOR_ORDERING,
+    prune: bool = True,
 ):
     """
     Perform a modified DFS traversal on the graph to ensure
     it starts and ends with specific nodes.
+    From each node, neighbors are tried in this order: nodes of the next mid
+    border, other unvisited nodes, end nodes and finally a step back along the
+    path, which allows the walk to revisit nodes to reach the rest of the graph.
+    Within each group, neighbors are ordered by the NEIGHBOR_ORDERINGS strategy
+    named by neighbor_ordering.
+    The search uses an explicit stack, so it is not bounded by the recursion limit.
+    If budget is given and runs out, the search stops and reports no path.
+
+    Stepping back always moves to the node we first came from, so visited nodes
+    can only be reached again through the chain of nodes we can step back along.
+    With prune, moves that leave unvisited nodes, the end border or a remaining
+    mid border out of reach are skipped:
+    - stepping back out of an articulation point while one of its unvisited
+      neighbors is in a different biconnected component than the node we step
+      back to cuts that neighbor off for good,
+    - a border with no unvisited node and no node in the remaining chain can
+      not be reached anymore,
+    - crossing a bridge away from the entry node while unvisited nodes remain
+      on this side means the walk has to cross back, so it needs an end node
+      on this side of the bridge or in the chain.
+    Pruned moves could not lead to a path, so the result is the same as without pruning.
+    Returns whether a path was found, the path and the positions in the path
+    where each mid border was reached.
     """
+    indptr, indices = neighbors_csr(graph)
+    # Python lists are faster than NumPy arrays for scalar indexing in the loop
+    indptr, indices = indptr.tolist(), indices.tolist()
+    num_nodes = graph.vcount()
+    mid_ids = [set(node_ids) for node_ids in (border.node_ids for border in mid_borders)]
+    end_ids = last_border.node_ids
+    is_end = bytearray(num_nodes)
+    for node_id in end_ids:
+        is_end[node_id] = 1
+    no_mids = set()
+    ordering = NEIGHBOR_ORDERINGS[neighbor_ordering](graph, end_ids)
+    track_unvisited_degree = ordering.uses_unvisited_degree
+    unvisited_degree = [indptr[i + 1] - indptr[i] for i in range(num_nodes)]
+
+    if prune:
+        is_articulation = bytearray(num_nodes)
+        for node_id in graph.articulation_points():
+            is_articulation[node_id] = 1
+        blocks = node_blocks(graph)
+        # Mid border levels a node belongs to, as a bit mask
+        mid_mask = [0] * num_nodes
+        for level, node_ids in enumerate(mid_ids):
+            for node_id in node_ids:
+                mid_mask[node_id] |= 1 << level
+        num_unvisited_ends = int(sum(is_end))
+        num_unvisited_mids = [len(node_ids) for node_ids in mid_ids]
+        # Subtrees of a DFS tree rooted at the entry node, as preorder ranges.
+        # The far side of a bridge is the subtree of its child end.
+        dfs_order, dfs_parents = graph.dfs(entry_node_id)
+        dfs_parent = [-1] * num_nodes
+        preorder = [-1] * num_nodes
+        subtree_size = [1] * num_nodes
+        for position, (node_id, parent_id) in enumerate(zip(dfs_order, dfs_parents)):
+            preorder[node_id] = position
+            dfs_parent[node_id] = parent_id
+        for node_id in reversed(dfs_order[1:]):
+            subtree_size[dfs_parent[node_id]] += subtree_size[node_id]
+        bridges = {
+            (min(edge.tuple), max(edge.tuple)) for edge in graph.es.select(graph.bridges())
+        }
+        unvisited_tree = _FenwickTree(len(dfs_order))
+        unvisited_end_tree = _FenwickTree(len(dfs_order))
+        for node_id in dfs_order:
+            unvisited_tree.add(preorder[node_id], 1)
+            unvisited_end_tree.add(preorder[node_id], is_end[node_id])
+        # Number of end nodes and mask of mid levels among the node and the
+        # nodes we can step back to from it, set when the node is first visited
+        chain_ends = [0] * num_nodes
+        chain_mid_mask = [0] * num_nodes
 
-    # Helper function to perform DFS
-    def dfs(
-        node_id: int,
-        mid_ids: list[list[int]],
-        end_ids: list[int],
-        visited: set,
-        path: list[int],
-        mid_order: list[int],
-        go_back_idx: int = None,
-    ):
-        # if go_back_idx != None:
-        #     print(f"(Backtracking {go_back_idx}) Node {node_id} Next potential: {graph.neighbors(node_id)}, Curr state: Path: {path}, Mids: {mid_ids}, Ends: {end_ids}")
-        # else:
-        #     print(f"Node {node_id} Next potential: {graph.neighbors(node_id)}, Curr state: Path: {path}, Mids: {mid_ids}, Ends: {end_ids}")
-
-        visited.add(node_id)
+    path = []
+    # Index of the first occurrence of each node in path, -1 if it is not in path.
+    # Nodes in path are exactly the visited nodes.
+    first_idx = [-1] * num_nodes
+    num_visited = 0
+    mid_order = []
+    # Frame: [node id, next neighbor phase, next neighbor position, cur mids,
+    # go back idx, ordered neighbors]
+    stack = []
+
+    def enter(node_id: int, go_back_idx: int | None) -> bool:
+        nonlocal num_visited, num_unvisited_ends
+        if first_idx[node_id] < 0:
+            first_idx[node_id] = len(path)
+            num_visited += 1
+            if track_unvisited_degree:
+                for position in range(indptr[node_id], indptr[node_id + 1]):
+                    unvisited_degree[indices[position]] -= 1
+            if prune:
+                parent_id = path[-1] if path else None
+                chain_ends[node_id] = is_end[node_id] + (
+                    chain_ends[parent_id] if parent_id is not None else 0
+                )
+                chain_mid_mask[node_id] = mid_mask[node_id] | (
+                    chain_mid_mask[parent_id] if parent_id is not None else 0
+                )
+                num_unvisited_ends -= is_end[node_id]
+                for level in range(len(mid_ids)):
+                    if mid_mask[node_id] >> level & 1:
+                        num_unvisited_mids[level] -= 1
+                if preorder[node_id] >= 0:
+                    unvisited_tree.add(preorder[node_id], -1)
+                    unvisited_end_tree.add(preorder[node_id], -is_end[node_id])
         path.append(node_id)
-        cur_mids = []
+        cur_mids = no_mids
         if len(mid_order) < len(mid_ids):
             cur_mids = mid_ids[len(mid_order)]
             if node_id in cur_mids:
                 mid_order.append((node_id, len(path)))
                 cur_mids = (
-                    mid_ids[len(mid_order)] if len(mid_order) < len(mid_ids) else []
+                    mid_ids[len(mid_order)] if len(mid_order) < len(mid_ids) else no_mids
                 )
-        else:
+        elif is_end[node_id] or not end_ids:
             # If we've visited all nodes and the last node is the end node, we are done
-            if node_id in end_ids or not end_ids:
-                # print(f"END CHECKING {visited}, {len(visited)}=={graph.vcount()}")
-                if len(visited) == graph.vcount():
-                    return True
-
-        # Explore neighbors to find new mid nodes
-        for neighbor in graph.neighbors(node_id):
-            if (
-                neighbor not in visited
-                and neighbor not in end_ids
-                and neighbor in cur_mids
-            ):
-                if dfs(neighbor, mid_ids, end_ids, visited, path, mid_order):
-                    return True
-
-        # Explore neighbors to find new non ending nodes
-        for neighbor in graph.neighbors(node_id):
-            if (
-                neighbor not in visited
-                and neighbor not in end_ids
-                and neighbor not in cur_mids
-            ):
-                if dfs(neighbor, mid_ids, end_ids, visited, path, mid_order):
-                    return True
-
-        # Explore neighbors to find new ending nodes
-        for neighbor in graph.neighbors(node_id):
-            if neighbor not in visited and neighbor in end_ids:
-                if dfs(neighbor, mid_ids, end_ids, visited, path, mid_order):
-                    return True
-
-        # Explore neighbors to backtrack
-        for neighbor in graph.neighbors(node_id):
-            if go_back_idx != None:
-                # We have already gone back and we need to follow certain path
-                # If we backtracked to start, we cant go further.
-                if go_back_idx > 0:
-                    if neighbor == path[go_back_idx - 1]:
-                        # WRAP IN FUNCTION Get first appearence of that node
-                        for idx, _ in enumerate(path):
-                            if path[idx] == neighbor:
-                                go_back_idx = idx
-                                break
-                        if dfs(
-                            neighbor,
-                            mid_ids,
-                            end_ids,
-                            visited,
-                            path,
-                            mid_order,
-                            go_back_idx,
-                        ):
-                            return True
-            else:
-                # This is first time to potentially backtrack
-                if len(path) > 1:
-                    if neighbor == path[-2]:
-                        # WRAP IN FUNCTION Get first appearence of that node
-                        for idx, _ in enumerate(path):
-                            if path[idx] == neighbor:
-                                go_back_idx = idx
-                                break
-                        if dfs(
-                            neighbor,
-                            mid_ids,
-                            end_ids,
-                            visited,
-                            path,
-                            mid_order,
-                            go_back_idx,
-                        ):
-                            return True
+            if num_visited == num_nodes:
+                return True
+        neighbors = ordering.order(
+            indices[indptr[node_id] : indptr[node_id + 1]], unvisited_degree
+        )
+        stack.append([node_id, 0, 0, cur_mids, go_back_idx, neighbors])
+        return False
 
+    def leave(node_id: int) -> None:
+        nonlocal num_visited, num_unvisited_ends
         # Backtrack if no valid path found from current node
-        # print(f"Failed, backtracking path: {path}, visited: {visited}, {node_id}")
         if mid_order and mid_order[-1][1] == len(path):
             mid_order.pop()
         path.pop()
-        if node_id not in path:
-            visited.remove(node_id)
-        return False
+        if first_idx[node_id] == len(path):
+            first_idx[node_id] = -1
+            num_visited -= 1
+            if track_unvisited_degree:
+                for position in range(indptr[node_id], indptr[node_id + 1]):
+                    unvisited_degree[indices[position]] += 1
+            if prune:
+                num_unvisited_ends += is_end[node_id]
+                for level in range(len(mid_ids)):
+                    if mid_mask[node_id] >> level & 1:
+                        num_unvisited_mids[level] += 1
+                if preorder[node_id] >= 0:
+                    unvisited_tree.add(preorder[node_id], 1)
+                    unvisited_end_tree.add(preorder[node_id], is_end[node_id])
+
+    def can_cross(node_id: int, neighbor: int) -> bool:
+        """False if moving forward from node_id to the unvisited neighbor can not lead to a path."""
+        if (
+            not end_ids
+            or dfs_parent[neighbor] != node_id
+            or (min(node_id, neighbor), max(node_id, neighbor)) not in bridges
+        ):
+            return True
+        start = preorder[neighbor]
+        end = start + subtree_size[neighbor]
+        num_unvisited_outside = num_nodes - num_visited - unvisited_tree.range_sum(start, end)
+        if num_unvisited_outside == 0 or chain_ends[node_id] > 0:
+            return True
+        return num_unvisited_ends > unvisited_end_tree.range_sum(start, end)
+
+    def can_step_back(node_id: int, target_id: int) -> bool:
+        """False if stepping back from node_id to target_id can not lead to a path."""
+        if (
+            is_articulation[node_id]
+            and first_idx[node_id] > 0
+            and path[first_idx[node_id] - 1] == target_id
+        ):
+            target_block = common_block(blocks, node_id, target_id)
+            for position in range(indptr[node_id], indptr[node_id + 1]):
+                neighbor = indices[position]
+                if (
+                    first_idx[neighbor] < 0
+                    and common_block(blocks, node_id, neighbor) != target_block
+                ):
+                    return False
+        if end_ids and num_unvisited_ends == 0 and chain_ends[target_id] == 0:
+            return False
+        for level in range(len(mid_order), len(mid_ids)):
+            if num_unvisited_mids[level] == 0 and not chain_mid_mask[target_id] >> level & 1:
+                return False
+        return True
+
+    def next_step(frame: list) -> tuple[int, int | None] | None:
+        """Advance the frame to its next neighbor to descend into, or None if exhausted."""
+        node_id, phase, position, cur_mids, go_back_idx, neighbors = frame
+        while phase < 4:
+            while position < len(neighbors):
+                neighbor = neighbors[position]
+                position += 1
+                if phase == 0:
+                    # Neighbors that are the next mid nodes
+                    if first_idx[neighbor] < 0 and not is_end[neighbor] and neighbor in cur_mids:
+                        if prune and not can_cross(node_id, neighbor):
+                            continue
+                        frame[1], frame[2] = phase, position
+                        return neighbor, None
+                elif phase == 1:
+                    # Neighbors that are new non ending nodes
+                    if first_idx[neighbor] < 0 and not is_end[neighbor] and neighbor not in cur_mids:
+                        if prune and not can_cross(node_id, neighbor):
+                            continue
+                        frame[1], frame[2] = phase, position
+                        return neighbor, None
+                elif phase == 2:
+                    # Neighbors that are new ending nodes
+                    if first_idx[neighbor] < 0 and is_end[neighbor]:
+                        if prune and not can_cross(node_id, neighbor):
+                            continue
+                        frame[1], frame[2] = phase, position
+                        return neighbor, None
+                elif go_back_idx is not None:
+                    # We have already gone back and we need to follow certain path.
+                    # If we backtracked to start, we cant go further.
+                    if go_back_idx > 0 and neighbor == path[go_back_idx - 1]:
+                        go_back_idx = first_idx[neighbor]
+                        if prune and not can_step_back(node_id, neighbor):
+                            continue
+                        frame[1], frame[2], frame[4] = phase, position, go_back_idx
+                        return neighbor, go_back_idx
+                elif len(path) > 1 and neighbor == path[-2]:
+                    # This is first time to potentially backtrack
+                    go_back_idx = first_idx[neighbor]
+                    if prune and not can_step_back(node_id, neighbor):
+                        continue
+                    frame[1], frame[2], frame[4] = phase, position, go_back_idx
+                    return neighbor, go_back_idx
+            phase += 1
+            position = 0
+        frame[1] = phase
+        return None
 
-    visited = set()
-    path = []
-    mid_order = []
-    mid_node_ids = [border.node_ids for border in mid_borders]
     print(
-        f"Starting DFS from node {entry_node_id} with mid nodes {mid_node_ids} and end nodes {last_border.node_ids}"
-    )
-    found_path = dfs(
-        node_id=entry_node_id,
-        mid_ids=mid_node_ids,
-        end_ids=last_border.node_ids,
-        visited=visited,
-        path=path,
-        mid_order=mid_order,
+        f"Starting DFS from node {entry_node_id} with mid nodes {[border.node_ids for border in mid_borders]} and end nodes {end_ids}"
     )
+    found_path = enter(entry_node_id, None)
+    while stack and not found_path:
+        step = next_step(stack[-1])
+        if step is None:
+            leave(stack.pop()[0])
+        elif budget is not None and budget.spend():
+            break
+        else:
+            found_path = enter(*step)
+
+    # Positions are stored after the node is appended
+    mid_exit_positions = [position - 1 for _, position in mid_order]
+    return found_path, path, mid_exit_positions
 
-    mid_exits = [m[0] for m in mid_order]
-    return found_path, path, mid_exits
+
+def _walk_to(graph: Graph, path: list[int], target_ids: list[int], visited: set) -> int:
+    """
+    Extend path with a shortest walk from its last node to the closest target,
+    preferring targets that were not visited yet. Unreachable targets are jumped to.
+    Returns the position of the reached target in path. Without targets, path
+    is not extended and its last position is returned.
+    """
+    if not target_ids:
+        return len(path) - 1
+    unvisited_target_ids = [node_id for node_id in target_ids if node_id not in visited]
+    target_ids = unvisited_target_ids or target_ids
+    if path[-1] in target_ids:
+        return len(path) - 1
+    reachable = set(graph.subcomponent(path[-1]))
+    reachable_target_ids = [node_id for node_id in target_ids if node_id in reachable]
+    if reachable_target_ids:
+        walks = graph.get_shortest_paths(path[-1], to=reachable_target_ids, output="vpath")
+        walk = min(walks, key=len)[1:]
+    else:
+        walk = [target_ids[0]]
+    path.extend(walk)
+    visited.update(walk)
+    return len(path) - 1
+
+
+def _cover_component(graph: Graph, path: list[int], visited: set) -> None:
+    """
+    Extend path with a walk along a DFS tree rooted at its last node that enters
+    every subtree containing unvisited nodes and returns to the root.
+    """
+    root = path[-1]
+    # Parents are aligned with the visiting order, not indexed by node id
+    order, parents = graph.dfs(root)
+    children = defaultdict(list)
+    for node_id, parent_id in zip(order[1:], parents[1:]):
+        children[parent_id].append(node_id)
+    # Children are finished before their parents in reversed preorder
+    needs_visit = {}
+    for node_id in reversed(order):
+        needs_visit[node_id] = node_id not in visited or any(
+            needs_visit[child] for child in children[node_id]
+        )
+    stack = [(root, iter(children[root]))]
+    while stack:
+        node_id, remaining_children = stack[-1]
+        child = next((c for c in remaining_children if needs_visit[c]), None)
+        if child is None:
+            stack.pop()
+            if stack:
+                path.append(stack[-1][0])
+        else:
+            path.append(child)
+            visited.add(child)
+            stack.append((child, iter(children[child])))
+
+
+def approximate_traversal(
+    graph: Graph,
+    entry_node_id: int,
+    mid_borders: list[LocalBorderNodes],
+    last_border: LocalBorderNodes,
+) -> tuple[list[int], list[int]]:
+    """
+    Fallback for modified_dfs that always finishes in polynomial time. It walks
+    to the closest node of each mid border in order, covers the remaining nodes
+    with DFS tree walks and finally walks to the closest node of the last border.
+    Nodes can be revisited, and disconnected parts are reached by jumping.
+    Returns the path and, for every mid border, the position in the path where
+    it was reached. A reached node can have been visited before, and an empty
+    border is reached wherever the walk is.
+    """
+    path = [entry_node_id]
+    visited = {entry_node_id}
+    mid_exit_positions = [
+        _walk_to(graph, path, border.node_ids, visited) for border in mid_borders
+    ]
+    _cover_component(graph, path, visited)
+    for node_id in range(graph.vcount()):
+        if node_id not in visited:
+            path.append(node_id)
+            visited.add(node_id)
+            _cover_component(graph, path, visited)
+    if last_border.node_ids:
+        _walk_to(graph, path, last_border.node_ids, visited)
+    return path, mid_exit_positions
@@ -0,0 +1,195 @@
+import contextlib
+import io
+import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from igraph import Graph
+
+from docudialogue.graphs.graph_utils import (
+    DEFAULT_NEIGHBOR_ORDERING,
+    LocalBorderNodes,
+    SearchBudget,
+    modified_dfs,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Set in every worker process by _init_worker, shared with the parent process
+_cancel_event = None
+
+
+def _init_worker(cancel_event) -> None:
+    global _cancel_event
+    _cancel_event = cancel_event
+
+
+def _search_from_entry(
+    graph: Graph,
+    entry_node_id: int,
+    mid_borders: list[LocalBorderNodes],
+    last_border: LocalBorderNodes,
+    max_expansions: int | None,
+    time_budget: float | None,
+    neighbor_ordering: str,
+) -> tuple[bool, list[int], list[int], int]:
+    """Runs modified_dfs from one entry node in a worker process."""
+    budget = SearchBudget(
+        max_expansions, time_budget, should_stop=_cancel_event.is_set
+    ).start()
+    # Output of concurrent searches would be interleaved
+    with contextlib.redirect_stdout(io.StringIO()):
+        found_path, path, mid_exit_positions = modified_dfs(
+            graph, entry_node_id, mid_borders, last_border, budget, neighbor_ordering
+        )
+    return found_path, path, mid_exit_positions, budget.expansions
+
+
+def count_revisits(path: list[int]) -> int:
+    return len(path) - len(set(path))
+
+
+class PortfolioSearch:
+    """
+    Runs modified_dfs from several entry nodes of a community at once in a
+    process pool, so that the result does not depend on the order of entry nodes.
+    By default the first path found wins and the remaining searches are cancelled.
+    With collect_all, every search that finishes within the deadline is kept and
+    the path with the fewest revisits is chosen.
+    The pool is created on first use and shared by all communities of a graph.
+    """
+
+    def __init__(
+        self,
+        num_workers: int = 4,
+        deadline: float = 5.0,
+        collect_all: bool = False,
+        max_candidates: int = 8,
+        min_nodes: int = 64,
+    ) -> None:
+        self.num_workers = num_workers
+        self.deadline = deadline
+        self.collect_all = collect_all
+        self.max_candidates = max_candidates
+        # Smaller communities are searched faster than a task is shipped to a worker
+        self.min_nodes = min_nodes
+        self._executor = None
+        self._cancel_event = None
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "PortfolioSearch | None":
+        if not config or not config.get("enabled", False):
+            return None
+        return cls(
+            num_workers=config.get("num_workers", 4),
+            deadline=config.get("deadline_seconds", 5.0),
+            collect_all=config.get("collect_all", False),
+            max_candidates=config.get("max_candidates", 8),
+            min_nodes=config.get("min_nodes", 64),
+        )
+
+    def __getstate__(self) -> dict:
+        # Communities holding the portfolio are pickled with the triplet graph
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        state["_cancel_event"] = None
+        return state
+
+    def applies(self, graph: Graph, entry_node_ids: list[int]) -> bool:
+        return (
+            self.num_workers > 1
+            and len(entry_node_ids) > 1
+            and graph.vcount() >= self.min_nodes
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            context = multiprocessing.get_context()
+            self._cancel_event = context.Event()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._cancel_event,),
+            )
+        return self._executor
+
+    def search(
+        self,
+        graph: Graph,
+        entry_node_ids: list[int],
+        mid_borders: list[LocalBorderNodes],
+        last_border: LocalBorderNodes,
+        budget: SearchBudget | None = None,
+        neighbor_ordering: str = DEFAULT_NEIGHBOR_ORDERING,
+    ) -> tuple[bool, list[int], list[int], int]:
+        """
+        Searches from up to max_candidates entry nodes and returns whether a path
+        was found, the path, the chosen mid exits and the total number of expansions.
+        Every search gets the expansion limit of budget, none runs past the deadline.
+        """
+        executor = self._get_executor()
+        # Attributes are not needed by the search and can be large
+        structure = Graph(n=graph.vcount(), edges=graph.get_edgelist())
+        max_expansions = budget.max_expansions if budget is not None else None
+        time_budget = self.deadline
+        if budget is not None and budget.time_budget is not None:
+            time_budget = min(time_budget, budget.time_budget)
+
+        futures: dict[Future, int] = {
+            executor.submit(
+                _search_from_entry,
+                structure,
+                entry_node_id,
+                mid_borders,
+                last_border,
+                max_expansions,
+                time_budget,
+                neighbor_ordering,
+            ): rank
+            for rank, entry_node_id in enumerate(entry_node_ids[: self.max_candidates])
+        }
+        results: dict[int, tuple[bool, list[int], list[int], int]] = {}
+        deadline = time.monotonic() + time_budget
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(
+                    pending,
+                    timeout=max(deadline - time.monotonic(), 0),
+                    return_when=FIRST_COMPLETED,
+                )
+                if not done:
+                    logger.info(
+                        f"Portfolio search deadline reached with {len(pending)} searches running"
+                    )
+                    break
+                for future in done:
+                    results[futures[future]] = future.result()
+                if not self.collect_all and any(found for found, *_ in results.values()):
+                    break
+        finally:
+            # Stops running searches at their next clock check
+            self._cancel_event.set()
+            for future in pending:
+                future.cancel()
+            wait(pending)
+            self._cancel_event.clear()
+
+        expansions = sum(result[3] for result in results.values())
+        found = [(rank, result) for rank, result in results.items() if result[0]]
+        if not found:
+            return False, [], [], expansions
+        # Fewest revisits, earlier entry nodes on ties
+        _, (_, path, mid_exit_positions, _) = min(
+            found, key=lambda item: (count_revisits(item[1][1]), item[0])
+        )
+        return True, path, mid_exit_positions, expansions
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+            self._cancel_event = None
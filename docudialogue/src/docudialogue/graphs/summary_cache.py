@@ -0,0 +1,95 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class SummaryCache:
+    """
+    SQLite-backed store of summaries that outlives graph rebuilds.
+    Entries are keyed by a fingerprint of what was summarized (e.g. the sorted
+    description list of a vertex, or the nodes and edges of a community) and
+    the prompt version, so on a new run only items whose fingerprint changed
+    need an LLM call. Unlike the LLM response cache, hits do not depend on how
+    items were batched into prompts.
+    """
+
+    # Maximum number of keys in one SELECT
+    _QUERY_CHUNK_SIZE = 500
+
+    def __init__(self, path: str) -> None:
+        folder_path = os.path.dirname(path)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        self._path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, summary TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SummaryCache | None":
+        if not config.get("enabled", False):
+            return None
+        return cls(path=config["path"])
+
+    @staticmethod
+    def fingerprint(content: Any, prompt_version: str) -> str:
+        """Stable hash of JSON serializable content, lists should already be sorted."""
+        serialized = json.dumps(
+            {"content": content, "prompt_version": prompt_version},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def prompt_version(*parts: str) -> str:
+        """Short hash of the prompts and model name used to produce summaries."""
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def get(self, key: str) -> str | None:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, str]:
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), self._QUERY_CHUNK_SIZE):
+            chunk = keys[start : start + self._QUERY_CHUNK_SIZE]
+            rows = self._connection.execute(
+                f"SELECT key, summary FROM summaries WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            found.update(rows)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, summary: str) -> None:
+        self.set_many({key: summary})
+
+    def set_many(self, summaries: dict[str, str]) -> None:
+        now = time.time()
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO summaries (key, summary, created) VALUES (?, ?, ?)",
+            [(key, summary, now) for key, summary in summaries.items()],
+        )
+        self._connection.commit()
+
+    def stats(self) -> dict:
+        count = self._connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": count}
+
+    def close(self) -> None:
+        logger.info(f"Summary cache stats: {self.stats()}")
+        self._connection.close()
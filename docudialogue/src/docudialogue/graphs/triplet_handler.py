@@ -1,23 +1,39 @@
 from abc import ABC, abstractmethod
+from typing import Iterable
 import igraph as ig
 import leidenalg
 
 from docudialogue.graphs.community import Community
-from docudialogue.graphs.community_group import CommunityGroup
+from docudialogue.graphs.community_group import (
+    CommunityGroup,
+    traverse_groups_in_parallel,
+)
+from docudialogue.graphs.description_compaction import DescriptionCompactor
+from docudialogue.graphs.description_summarizer import DescriptionSummarizer
+from docudialogue.graphs.graph_builder import (
+    TripletGraphBuilder,
+    build_graph_from_triplets,
+)
 from docudialogue.graphs.graph_utils import (
+    DEFAULT_NEIGHBOR_ORDERING,
     OrderType,
+    SearchBudget,
+    find_best_partition,
     find_neighbour_connections,
     order_list,
     order_nodes_by_centralization,
-    summarize_descriptions,
 )
-from docudialogue.llm_wrappers.prompts import SUMMARIZE_DESCRIPTIONS_PROMPT
-from docudialogue.triplet_extraction.classes import Entity, Relationship, Triplet
+from docudialogue.graphs.portfolio_search import PortfolioSearch
+from docudialogue.triplet_extraction.classes import Triplet
 
 
 
 class TripletGraph:
-    def __init__(self, triplets: list[Triplet]):
+    def __init__(
+        self,
+        triplets: Iterable[Triplet] | TripletGraphBuilder | ig.Graph,
+        config: dict | None = None,
+    ):
         """
         TripletGraph creates a graph structures from triplets.
         Steps:
@@ -31,83 +47,52 @@ class TripletGraph:
         order for the whole graph.
         """
 
-        self._graph = ig.Graph(directed=False)
+        self._config = config or {}
         self._initialize_graph(triplets)
         # self._summarize_graph_descriptions()
         self._communities = self._create_communities()
-        self._community_groups = self._create_community_groups()
+        try:
+            self._community_groups = self._create_community_groups()
+        finally:
+            if self._portfolio is not None:
+                self._portfolio.close()
         self._community_groups_traversal_order = self._order_groups_for_traversal()
         self.global_traversal, self.global_traversal_parents = (
             self.visit_community_groups()
         )
 
-    def _add_or_update_node(self, entity: Entity, added_entites: dict) -> str:
-        entity_id = entity.type + " " + entity.name
-        if entity_id not in added_entites:
-            node_id = self._graph.add_vertex(
-                name=entity_id,
-                entity_name=entity.name,
-                type=entity.type,
-                descriptions=[entity.description],
-                desc="",
-            ).index
-            added_entites[entity_id] = node_id
-        else:
-            node_id = added_entites[entity_id]
-            if entity.description not in self._graph.vs[node_id]["descriptions"]:
-                self._graph.vs[node_id]["descriptions"].append(entity.description)
-        return node_id
-
-    def _add_or_update_edge(
-        self, source_node_id: str, target_node_id: str, rel: Relationship
+    def _initialize_graph(
+        self, triplets: Iterable[Triplet] | TripletGraphBuilder | ig.Graph
     ):
-        edge = self._graph.es.select(_source=source_node_id, _target=target_node_id)
-        if edge:
-            edge = edge[0]
-            if rel.description not in edge["descriptions"]:
-                edge["descriptions"].append(rel.description)
-            edge["strength"] = max(edge["strength"], rel.strength)
-        else:
-            self._graph.add_edge(
-                source_node_id,
-                target_node_id,
-                descriptions=[rel.description],
-                strength=rel.strength,
-                desc="",
-            )
-
-    def _initialize_graph(self, triplets: list[Triplet]):
         """Add subject and object entites to graph as vertices (nodes) and relationship
-        as edge. If either of those already exists, update its description."""
-
-        existing_nodes = {}
-
-        for triplet in triplets:
-            subject_node_id = self._add_or_update_node(triplet.subject, existing_nodes)
-            object_node_id = self._add_or_update_node(triplet.object, existing_nodes)
+        as edge. If either of those already exists, update its description.
+        Triplets are first folded into node and edge tables and then added in bulk.
+        A builder that was filled incrementally (e.g. while streaming) can be passed instead,
+        or a graph it already built (e.g. with summarized descriptions).
+        Description lists of triplets are compacted if enabled in the "compaction" config."""
 
-            self._add_or_update_edge(
-                subject_node_id, object_node_id, triplet.relationship
+        if isinstance(triplets, ig.Graph):
+            self._graph = triplets
+        elif isinstance(triplets, TripletGraphBuilder):
+            self._graph = triplets.build()
+        else:
+            self._graph = build_graph_from_triplets(
+                triplets, DescriptionCompactor.from_config(self._config.get("compaction"))
             )
 
     async def _summarize_graph_descriptions(self):
         """ "Create cohesive description out of dscription list.
-        Summarization will be done if list has more than 1 element."""
+        Summarization will be done if list has more than 1 element.
+        Communities copy descriptions when they are created, so DocumentPipeline
+        summarizes the graph before it is passed to TripletGraph."""
 
-        for vertex in self._graph.vs:
-            vertex["desc"] = await summarize_descriptions(
-                vertex["descriptions"], SUMMARIZE_DESCRIPTIONS_PROMPT
-            )
-
-        for edge in self._graph.es:
-            edge["desc"] = await summarize_descriptions(
-                edge["descriptions"], SUMMARIZE_DESCRIPTIONS_PROMPT
-            )
+        await DescriptionSummarizer.from_config(self._config).summarize_graph(self._graph)
 
     def _create_communities(self) -> list[Community]:
         """
         Create communities from iGraph:
         1. Apply the Leiden algorithm on iGraph we previously populated with entites and relationships.
+            With partition.num_runs > 1, several seeded runs are made and the partition with the best modularity is kept.
         2. For each community, find connections that connect that community to neightbouring communties.
             Connection represent 3 ids:
                 a) current community exit node id
@@ -116,14 +101,36 @@ class TripletGraph:
         3. Create Community object for each community and add it to the list of communities.
         4. Return the list of communities.
         """
-        partition = leidenalg.find_partition(
-            self._graph, leidenalg.ModularityVertexPartition
+        partition_config = self._config.get("partition", {})
+        partition = find_best_partition(
+            self._graph,
+            num_runs=partition_config.get("num_runs", 1),
+            seed=partition_config.get("seed"),
+            num_workers=partition_config.get("num_workers", 1),
         )
+        # Community groups are built from the same partition
+        self._community_membership = partition.membership
         communities = []
         self._neighbour_connections = find_neighbour_connections(self._graph, partition)
+        traversal_config = self._config.get("traversal", {})
+        search_budget = SearchBudget.from_config(traversal_config)
+        neighbor_ordering = traversal_config.get(
+            "neighbor_ordering", DEFAULT_NEIGHBOR_ORDERING
+        )
+        # Shared by all communities, traversals run while creating community groups
+        self._portfolio = PortfolioSearch.from_config(traversal_config.get("portfolio"))
         for idx, subgraph in enumerate(partition.subgraphs()):
             communities.append(
-                Community(idx, self._graph, subgraph, self._neighbour_connections[idx])
+                Community(
+                    idx,
+                    self._graph,
+                    subgraph,
+                    self._neighbour_connections[idx],
+                    search_budget,
+                    neighbor_ordering,
+                    self._portfolio,
+                    member_ids=partition[idx],
+                )
             )
         return communities
 
@@ -131,11 +138,19 @@ class TripletGraph:
         """
         Create community groups from iGraph:
         1. Create a new graph from the partition of the original graph using the aggregate_partition method.
-        2. Order all nodes (1 node = 1 community) of the new graph by their centrality.
+        2. Order all nodes (1 node = 1 community) of the new graph by their centrality (graph config "centrality",
+           with the options of each measure under "options").
         3. Create a CommunityGroup object for each community in the partition and add it to the dictionary of community groups.
+        With parallel_groups enabled, groups are traversed in worker processes after all of them are created.
         """
         group_graph = self._group_communities()
-        community_ids_ordered = order_nodes_by_centralization(group_graph)
+        centrality_config = self._config.get("centrality", {})
+        measure = centrality_config.get("measure", "katz")
+        community_ids_ordered = order_nodes_by_centralization(
+            group_graph, measure, **centrality_config.get("options", {}).get(measure, {})
+        )
+        parallel_config = self._config.get("traversal", {}).get("parallel_groups") or {}
+        parallel = parallel_config.get("enabled", False)
         community_groups = {}
         community_groups_from_partition = group_graph.connected_components()
         for idx, community_ids in enumerate(community_groups_from_partition):
@@ -145,13 +160,20 @@ class TripletGraph:
                 communities={id: self._communities[id] for id in community_ids},
                 community_ids_ordered=community_ids_ordered,
                 neighbour_connections=self._neighbour_connections,
+                traverse=not parallel,
             )
             community_groups[idx] = community_group
+        if parallel:
+            traverse_groups_in_parallel(
+                community_groups.values(),
+                num_workers=parallel_config.get("num_workers", 4),
+                min_communities=parallel_config.get("min_communities", 2),
+            )
         return community_groups
 
     def _group_communities(self) -> ig.Graph:
-        partition = leidenalg.find_partition(
-            self._graph, leidenalg.ModularityVertexPartition
+        partition = leidenalg.ModularityVertexPartition(
+            self._graph, initial_membership=self._community_membership
         )
         aggregate_partition = partition.aggregate_partition(partition)
         return aggregate_partition.graph
@@ -199,6 +221,22 @@ class TripletGraph:
                 new_traverse_order_parents.append(val2)
         return new_traverse_order, new_traverse_order_parents
 
+    @property
+    def graph(self) -> ig.Graph:
+        return self._graph
+
+    def node_community_ids(self) -> list[int]:
+        """Community id of every node in the graph."""
+        return list(self._community_membership)
+
+    def community_group_ids(self) -> dict[int, int]:
+        """Community group id of every community."""
+        return {
+            community_id: group_id
+            for group_id, group in self._community_groups.items()
+            for community_id in group.communities
+        }
+
     def visit_community_groups(self):
         """
         Based on previously defined traversal order within each community,
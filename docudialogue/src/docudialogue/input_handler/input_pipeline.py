@@ -1,10 +1,20 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+from typing import AsyncIterator
+
 from haystack.components.converters import MarkdownToDocument, PyPDFToDocument, TextFileToDocument
 from haystack.components.preprocessors import DocumentSplitter, DocumentCleaner
 from haystack.components.routers import FileTypeRouter
 from haystack.components.joiners import DocumentJoiner
-from haystack import Pipeline
+from haystack import Document, Pipeline
 from haystack.document_stores.in_memory import InMemoryDocumentStore
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
 class PreprocessingPipeline:
     def __init__(self, config: dict) -> None:
         # FileTypeRouter will redirect each file to apporpriate Converter
@@ -51,4 +61,89 @@ class PreprocessingPipeline:
                     "sources": [source]
                 }
             }
-        )
\ No newline at end of file
+        )
+
+    def split(self, source: str) -> list[Document]:
+        return self.run(source)["document_splitter"]["documents"]
+
+
+# Pipeline built once per worker process by _init_worker
+_worker_pipeline: PreprocessingPipeline | None = None
+
+
+def _init_worker(config: dict) -> None:
+    global _worker_pipeline
+    _worker_pipeline = PreprocessingPipeline(config)
+
+
+def _split_file(source: str) -> tuple[list[Document], str | None]:
+    """Split a single file, returning the error instead of raising it."""
+    try:
+        return _worker_pipeline.split(source), None
+    except Exception as e:
+        return [], repr(e)
+
+
+def preprocess_files(
+    file_paths: list[str], config: dict, num_workers: int | None = None
+) -> tuple[list[list[Document]], dict[int, str]]:
+    """
+    Split files into chunks, fanning them out over num_workers processes.
+    Each worker builds its own PreprocessingPipeline once and reuses it for
+    all files it gets. Chunk lists are returned in the same order as file_paths.
+    A file that fails gets an empty chunk list and its error is returned in the
+    second element, keyed by the file index, so other files are not affected.
+    """
+    num_workers = min(num_workers or os.cpu_count() or 1, len(file_paths))
+    if num_workers <= 1:
+        _init_worker(config)
+        results = [_split_file(path) for path in file_paths]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=num_workers, initializer=_init_worker, initargs=(config,)
+        ) as executor:
+            results = list(executor.map(_split_file, file_paths))
+
+    docs, errors = [], {}
+    for idx, (chunks, error) in enumerate(results):
+        docs.append(chunks)
+        if error is not None:
+            logger.warning(f"Failed to preprocess {file_paths[idx]}: {error}")
+            errors[idx] = error
+    return docs, errors
+
+
+async def stream_preprocessed_files(
+    file_paths: list[str], config: dict, num_workers: int | None = None
+) -> AsyncIterator[tuple[int, list[Document]]]:
+    """
+    Split files in worker processes and yield (file index, chunks) as soon as
+    each file is done, in completion order. At most num_workers files are
+    being parsed or waiting to be consumed at any time.
+    Files that fail are logged and yielded with an empty chunk list.
+    """
+    num_workers = max(1, min(num_workers or os.cpu_count() or 1, len(file_paths)))
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(
+        max_workers=num_workers, initializer=_init_worker, initargs=(config,)
+    ) as executor:
+        remaining = iter(enumerate(file_paths))
+        running = {}
+
+        def submit_next() -> None:
+            next_file = next(remaining, None)
+            if next_file is not None:
+                idx, path = next_file
+                running[loop.run_in_executor(executor, _split_file, path)] = idx
+
+        for _ in range(num_workers):
+            submit_next()
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                idx = running.pop(future)
+                chunks, error = future.result()
+                if error is not None:
+                    logger.warning(f"Failed to preprocess {file_paths[idx]}: {error}")
+                yield idx, chunks
+                submit_next()
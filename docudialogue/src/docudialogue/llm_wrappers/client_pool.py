@@ -0,0 +1,102 @@
+import asyncio
+import logging
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, Timeout
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class ClientPoolConfig:
+    """
+    Connection pool settings shared by all OpenAI clients of the process.
+    Requests of every stage go through a few long lived keep-alive
+    connections instead of opening a new client (and TLS session) per component.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 10.0,
+        timeout: float = 600.0,
+        max_retries: int = 2,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "ClientPoolConfig":
+        config = config or {}
+        return cls(
+            max_connections=config.get("max_connections", 100),
+            max_keepalive_connections=config.get("max_keepalive_connections", 20),
+            keepalive_expiry=config.get("keepalive_expiry_seconds", 30.0),
+            connect_timeout=config.get("connect_timeout_seconds", 10.0),
+            timeout=config.get("timeout_seconds", 600.0),
+            max_retries=config.get("max_retries", 2),
+        )
+
+    def create_http_client(self) -> httpx.AsyncClient:
+        return DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+        )
+
+
+_pool_config = ClientPoolConfig()
+# Pooled connections belong to the event loop that opened them, so clients are
+# keyed by loop as well as by api key and base url
+_clients: dict[tuple[str, str | None, asyncio.AbstractEventLoop | None], AsyncOpenAI] = {}
+
+
+def configure_client_pool(config: dict | None) -> None:
+    """Set pool limits for clients created from now on."""
+    global _pool_config
+    _pool_config = ClientPoolConfig.from_config(config)
+
+
+def _current_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_openai_client(api_key: str, base_url: str | None = None) -> AsyncOpenAI:
+    """Return the shared client for api_key and base_url, creating it on first use."""
+    key = (api_key, base_url, _current_loop())
+    client = _clients.get(key)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=_pool_config.max_retries,
+            timeout=Timeout(_pool_config.timeout, connect=_pool_config.connect_timeout),
+            http_client=_pool_config.create_http_client(),
+        )
+        _clients[key] = client
+    return client
+
+
+async def close_openai_clients() -> None:
+    """
+    Close pooled connections of all shared clients. Clients of event loops that
+    are already closed can not be awaited anymore and are only dropped.
+    """
+    loop = _current_loop()
+    for key, client in list(_clients.items()):
+        client_loop = key[2]
+        if client_loop is None or client_loop is loop:
+            await client.close()
+        del _clients[key]
+    logger.info("Closed shared LLM clients")
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import re
+
+from pydantic import BaseModel
+
+from docudialogue.llm_wrappers.llm_wrappers import LLMModel
+from docudialogue.llm_wrappers.pydantic_classes import (
+    DialogueTurn,
+    EntityBase,
+    EntityRelationshipResponse,
+    EntityResponse,
+    EntityTypes,
+    ItemSummary,
+    RelationshipBase,
+    RelationshipResponse,
+    SummarizedDescription,
+    SummarizedDescriptions,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class FakeLLMError(Exception):
+    """Injected API error. status_code is read by the retry and rate limit logic."""
+
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"Injected error with status code {status_code}")
+        self.status_code = status_code
+
+
+class FakeLLMModel(LLMModel):
+    """
+    Offline LLMModel for benchmarking. Responses are schema valid and generated
+    deterministically from the prompt: entities are picked from words of the
+    input text, so chunks that share words also share graph nodes.
+    Latency is drawn from a configurable distribution and errors can be
+    injected with a given probability to exercise retries and rate limiting.
+    """
+
+    LATENCY_DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal")
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        latency_distribution: str = "lognormal",
+        latency_mean: float = 0.5,
+        latency_std: float = 0.2,
+        error_rate: float = 0.0,
+        rate_limit_error_rate: float = 0.0,
+        entity_types: list[str] | None = None,
+        max_entities: int = 8,
+        max_relationships: int = 12,
+        seed: int = 0,
+    ):
+        if latency_distribution not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution {latency_distribution}, "
+                f"expected one of {self.LATENCY_DISTRIBUTIONS}"
+            )
+        self.latency_distribution = latency_distribution
+        self.latency_mean = latency_mean
+        self.latency_std = latency_std
+        self.error_rate = error_rate
+        self.rate_limit_error_rate = rate_limit_error_rate
+        self.entity_types = entity_types or ["PERSON", "ORGANIZATION", "LOCATION", "EVENT"]
+        self.max_entities = max_entities
+        self.max_relationships = max_relationships
+        self.seed = seed
+        # Latency and errors only need to be reproducible as a sequence
+        self._rng = random.Random(seed)
+        self.num_calls = 0
+        self.num_errors = 0
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "FakeLLMModel":
+        config = config or {}
+        return cls(
+            latency_distribution=config.get("latency_distribution", "lognormal"),
+            latency_mean=config.get("latency_mean_seconds", 0.5),
+            latency_std=config.get("latency_std_seconds", 0.2),
+            error_rate=config.get("error_rate", 0.0),
+            rate_limit_error_rate=config.get("rate_limit_error_rate", 0.0),
+            entity_types=config.get("entity_types"),
+            max_entities=config.get("max_entities", 8),
+            max_relationships=config.get("max_relationships", 12),
+            seed=config.get("seed", 0),
+        )
+
+    def _sample_latency(self) -> float:
+        mean, std = self.latency_mean, self.latency_std
+        if self.latency_distribution == "constant" or mean <= 0:
+            return max(mean, 0.0)
+        if self.latency_distribution == "uniform":
+            return self._rng.uniform(max(mean - std, 0.0), mean + std)
+        if self.latency_distribution == "normal":
+            return max(self._rng.gauss(mean, std), 0.0)
+        # Lognormal parametrized so that it has the requested mean and std
+        sigma = math.sqrt(math.log(1 + (std / mean) ** 2))
+        return self._rng.lognormvariate(math.log(mean) - sigma**2 / 2, sigma)
+
+    async def _simulate_call(self, system_prompt: str, user_prompt: str, max_tokens: int):
+        await self._before_request(system_prompt, user_prompt, max_tokens)
+        self.num_calls += 1
+        await asyncio.sleep(self._sample_latency())
+        draw = self._rng.random()
+        if draw < self.rate_limit_error_rate:
+            self.num_errors += 1
+            raise FakeLLMError(429)
+        if draw < self.rate_limit_error_rate + self.error_rate:
+            self.num_errors += 1
+            raise FakeLLMError(500)
+
+    @staticmethod
+    def _prompt_rng(system_prompt: str, user_prompt: str, seed: int) -> random.Random:
+        digest = hashlib.sha256(f"{seed}\n{system_prompt}\n{user_prompt}".encode("utf-8"))
+        return random.Random(digest.digest())
+
+    @staticmethod
+    def _input_words(user_prompt: str) -> list[str]:
+        # Extraction prompts put the input text after the last "text:" marker
+        text = re.split(r"(?i)\btext:", user_prompt)[-1]
+        words = dict.fromkeys(word.upper() for word in re.findall(r"[^\W\d_]{4,}", text))
+        return list(words) or ["UNKNOWN"]
+
+    def _entities(self, rng: random.Random, words: list[str]) -> list[EntityBase]:
+        num_entities = rng.randint(1, min(self.max_entities, len(words)))
+        return [
+            EntityBase(
+                name=name,
+                # Type depends only on the name so the same word is the same node everywhere
+                type=self.entity_types[
+                    int(hashlib.md5(name.encode("utf-8")).hexdigest(), 16) % len(self.entity_types)
+                ],
+                description=f"{name.title()} is mentioned in the text.",
+            )
+            for name in rng.sample(words, num_entities)
+        ]
+
+    def _relationships(
+        self, rng: random.Random, entities: list[EntityBase]
+    ) -> list[RelationshipBase]:
+        if len(entities) < 2:
+            return []
+        return [
+            RelationshipBase(
+                subject=[subject.name, subject.type],
+                object=[object.name, object.type],
+                relationship_description=f"{subject.name.title()} is related to {object.name.title()}.",
+                relationship_strength=rng.randint(1, 10),
+            )
+            for subject, object in (
+                rng.sample(entities, 2)
+                for _ in range(rng.randint(1, self.max_relationships))
+            )
+        ]
+
+    def _generate(
+        self, system_prompt: str, user_prompt: str, response_format: type[BaseModel]
+    ) -> BaseModel:
+        rng = self._prompt_rng(system_prompt, user_prompt, self.seed)
+        words = self._input_words(user_prompt)
+        if response_format is EntityTypes:
+            return EntityTypes(types=list(self.entity_types))
+        if response_format is SummarizedDescription:
+            return SummarizedDescription(description=" ".join(words[:30]).capitalize())
+        if response_format is SummarizedDescriptions:
+            # Batch prompts put every description list on its own "Item <id>:" line
+            return SummarizedDescriptions(
+                summaries=[
+                    ItemSummary(
+                        id=int(item_id),
+                        description=" ".join(self._input_words(text)[:30]).capitalize(),
+                    )
+                    for item_id, text in re.findall(r"(?m)^Item (\d+): (.*)$", user_prompt)
+                ]
+            )
+        if response_format is DialogueTurn:
+            # Dialogue prompts describe the current entity on its own line
+            current = re.search(r"(?m)^Current entity: (.*)$", user_prompt)
+            current_words = self._input_words(current.group(1) if current else user_prompt)
+            return DialogueTurn(
+                question=f"What can you tell me about {' '.join(current_words[:3]).title()}?",
+                answer=" ".join(rng.sample(current_words, min(len(current_words), 20))).capitalize() + ".",
+            )
+        if response_format is EntityResponse:
+            return EntityResponse(entities=self._entities(rng, words))
+        if response_format is RelationshipResponse:
+            # Relationship prompts list the entities found earlier, so subjects
+            # and objects are picked from the same words as in EntityResponse
+            return RelationshipResponse(
+                relationships=self._relationships(rng, self._entities(rng, words))
+            )
+        if response_format is EntityRelationshipResponse:
+            entities = self._entities(rng, words)
+            return EntityRelationshipResponse(
+                entities=EntityResponse(entities=entities),
+                relationships=RelationshipResponse(
+                    relationships=self._relationships(rng, entities)
+                ),
+            )
+        raise NotImplementedError(f"Fake responses for {response_format.__name__} are not supported")
+
+    async def create(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model_name: str = "fake",
+        temperature: float = 1,
+        max_tokens: int = 3000,
+        top_p: float = 1.0,
+        frequency_penalty: float = 0.0,
+        presence_penalty: float = 0.0,
+    ) -> str:
+        await self._simulate_call(system_prompt, user_prompt, max_tokens)
+        return " ".join(self._input_words(user_prompt)[:30]).capitalize()
+
+    async def parse(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response_format: BaseModel,
+        model_name: str = "fake",
+        temperature: float = 0,
+        max_tokens: int = 4000,
+        top_p: float = 0.0,
+        frequency_penalty: float = 0.0,
+        presence_penalty: float = 0.0,
+    ) -> BaseModel:
+        await self._simulate_call(system_prompt, user_prompt, max_tokens)
+        return self._generate(system_prompt, user_prompt, response_format)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class LLMResponseCache:
+    """
+    Content-addressed, SQLite-backed cache for LLM responses.
+    Each entry is keyed by a hash of the model name, prompts, response schema
+    and sampling parameters. When the total size of stored responses exceeds
+    max_size_bytes, least recently used entries are evicted.
+    Access times of hits are kept in memory and written in one transaction
+    with the next set, after ACCESS_FLUSH_SIZE hits or on close, so lookups
+    do not pay for a write each.
+    """
+
+    ACCESS_FLUSH_SIZE = 1000
+
+    def __init__(self, path: str, max_size_bytes: int = 512 * 1024 * 1024) -> None:
+        folder_path = os.path.dirname(path)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        self._path = path
+        self._max_size_bytes = max_size_bytes
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._connection.commit()
+        self._total_size = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        # Last access time of hits not yet written to the database
+        self._pending_access: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "LLMResponseCache | None":
+        if not config.get("enabled", False):
+            return None
+        return cls(
+            path=config["path"],
+            max_size_bytes=int(config.get("max_size_mb", 512) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        response_format: type[BaseModel] | None,
+        **sampling_params: Any,
+    ) -> str:
+        payload = {
+            "model_name": model_name,
+            "system_prompt": system_prompt,
+            "user_prompt": user_prompt,
+            "response_format": (
+                response_format.model_json_schema() if response_format else None
+            ),
+            "sampling_params": sampling_params,
+        }
+        serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        row = self._connection.execute(
+            "SELECT value FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._pending_access[key] = time.time()
+        if len(self._pending_access) >= self.ACCESS_FLUSH_SIZE:
+            self._flush_access()
+            self._connection.commit()
+        return row[0]
+
+    def _flush_access(self) -> None:
+        """Write buffered access times, the caller commits."""
+        if not self._pending_access:
+            return
+        self._connection.executemany(
+            "UPDATE responses SET last_access = ? WHERE key = ?",
+            [(last_access, key) for key, last_access in self._pending_access.items()],
+        )
+        self._pending_access.clear()
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self._max_size_bytes:
+            return
+        # Eviction has to see the latest access times
+        self._flush_access()
+        previous = self._connection.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if previous is not None:
+            self._total_size -= previous[0]
+        self._connection.execute(
+            "INSERT OR REPLACE INTO responses (key, value, size, last_access) "
+            "VALUES (?, ?, ?, ?)",
+            (key, value, size, time.time()),
+        )
+        self._total_size += size
+        self._evict()
+        self._connection.commit()
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache fits its size bound."""
+        while self._total_size > self._max_size_bytes:
+            rows = self._connection.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total_size <= self._max_size_bytes:
+                    break
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_size -= size
+
+    def stats(self) -> dict:
+        count = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": count,
+            "size_bytes": self._total_size,
+        }
+
+    def close(self) -> None:
+        logger.info(f"LLM cache stats: {self.stats()}")
+        self._flush_access()
+        self._connection.commit()
+        self._connection.close()
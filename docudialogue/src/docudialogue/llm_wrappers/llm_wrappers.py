@@ -1,13 +1,33 @@
+import json
+import os
 from abc import ABC, abstractmethod
 from openai import AsyncOpenAI
 from pydantic import BaseModel
 
+from docudialogue.llm_wrappers.client_pool import get_openai_client
+from docudialogue.llm_wrappers.llm_cache import LLMResponseCache
+from docudialogue.llm_wrappers.rate_limiter import current_rate_limiter
+
 
 class LLMModel(ABC):
     @abstractmethod
     def __init__(self, api_key: str):
         raise NotImplementedError()
 
+    @staticmethod
+    def _estimate_tokens(system_prompt: str, user_prompt: str, max_tokens: int) -> int:
+        # Rough estimate of ~4 characters per token. Completion tokens are
+        # counted as max_tokens, same as the API does for rate limiting.
+        return (len(system_prompt) + len(user_prompt)) // 4 + max_tokens
+
+    async def _before_request(self, system_prompt: str, user_prompt: str, max_tokens: int):
+        rate_limiter = current_rate_limiter.get()
+        if rate_limiter is not None:
+            await rate_limiter.acquire_tokens(
+                self._estimate_tokens(system_prompt, user_prompt, max_tokens)
+            )
+        return rate_limiter
+
     @abstractmethod
     async def create(
         self,
@@ -39,8 +59,20 @@ class LLMModel(ABC):
 
 
 class OpenAIModel(LLMModel):
-    def __init__(self, api_key: str):
-        self.client = AsyncOpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        cache: LLMResponseCache | None = None,
+        base_url: str | None = None,
+    ):
+        self._api_key = api_key
+        self._base_url = base_url
+        self.cache = cache
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Client is looked up per request so all models share pooled connections
+        return get_openai_client(self._api_key, self._base_url)
 
     async def create(
         self,
@@ -53,21 +85,41 @@ class OpenAIModel(LLMModel):
         frequency_penalty: float = 0.0,
         presence_penalty: float = 0.0,
     ) -> str:
-        system_message = {"role": "system", "content": system_prompt}
-        user_message = {"role": "user", "content": user_prompt}
-        return (
-            await self.client.chat.completions.create(
-                model=model_name,
-                messages=[system_message, user_message],
+        cache_key = None
+        if self.cache is not None:
+            cache_key = LLMResponseCache.make_key(
+                model_name,
+                system_prompt,
+                user_prompt,
+                None,
                 temperature=temperature,
                 max_tokens=max_tokens,
                 top_p=top_p,
                 frequency_penalty=frequency_penalty,
                 presence_penalty=presence_penalty,
             )
-            .choices[0]
-            .message.content
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+        system_message = {"role": "system", "content": system_prompt}
+        user_message = {"role": "user", "content": user_prompt}
+        rate_limiter = await self._before_request(system_prompt, user_prompt, max_tokens)
+        raw_response = await self.client.chat.completions.with_raw_response.create(
+            model=model_name,
+            messages=[system_message, user_message],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            frequency_penalty=frequency_penalty,
+            presence_penalty=presence_penalty,
         )
+        if rate_limiter is not None:
+            rate_limiter.update_from_headers(raw_response.headers)
+        response = raw_response.parse()
+        content = response.choices[0].message.content
+        if cache_key is not None and content is not None:
+            self.cache.set(cache_key, json.dumps(content))
+        return content
 
     async def parse(
         self,
@@ -81,9 +133,26 @@ class OpenAIModel(LLMModel):
         frequency_penalty: float = 0.0,
         presence_penalty: float = 0.0,
     ) -> BaseModel:
+        cache_key = None
+        if self.cache is not None:
+            cache_key = LLMResponseCache.make_key(
+                model_name,
+                system_prompt,
+                user_prompt,
+                response_format,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=top_p,
+                frequency_penalty=frequency_penalty,
+                presence_penalty=presence_penalty,
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return response_format.model_validate_json(cached)
         system_message = {"role": "system", "content": system_prompt}
         user_message = {"role": "user", "content": user_prompt}
-        response = await self.client.beta.chat.completions.parse(
+        rate_limiter = await self._before_request(system_prompt, user_prompt, max_tokens)
+        raw_response = await self.client.beta.chat.completions.with_raw_response.parse(
             model=model_name,
             messages=[system_message, user_message],
             temperature=temperature,
@@ -93,4 +162,31 @@ class OpenAIModel(LLMModel):
             presence_penalty=presence_penalty,
             response_format=response_format,
         )
-        return response.choices[0].message.parsed
+        if rate_limiter is not None:
+            rate_limiter.update_from_headers(raw_response.headers)
+        response = raw_response.parse()
+        parsed = response.choices[0].message.parsed
+        if cache_key is not None and parsed is not None:
+            self.cache.set(cache_key, parsed.model_dump_json())
+        return parsed
+
+
+def create_llm_model(
+    config: dict | None, cache: LLMResponseCache | None = None
+) -> LLMModel:
+    """
+    Create the model selected by the "backend" key of an "llm" config section:
+    "openai" (default) or "fake" for offline benchmarking.
+    """
+    config = config or {}
+    backend = config.get("backend", "openai")
+    if backend == "openai":
+        return OpenAIModel(
+            os.environ["LLM_API_KEY"], cache=cache, base_url=config.get("base_url")
+        )
+    if backend == "fake":
+        # Imported here because fake_model depends on LLMModel from this module
+        from docudialogue.llm_wrappers.fake_model import FakeLLMModel
+
+        return FakeLLMModel.from_config(config.get("fake"))
+    raise ValueError(f"Unknown LLM backend {backend}")
@@ -199,8 +199,39 @@ You will be given list of descriptions that describe certain entity or relations
 Here are the descriptions: {descriptions}
 """
 
+SUMMARIZE_DESCRIPTIONS_BATCH_PROMPT = """
+You will be given several numbered lists of descriptions, each list describes a certain entity or relationship. Your job is to provide, for each list, short summary that captures all of the distinct information from each description in that list. Purpose of summarization is for each entity or relationship to have a single concise description. Return one summary for every list together with the number of that list.
+
+Here are the description lists:
+{description_lists}
+"""
+
 SUMMARIZE_GRAPH_PROMPT = """
 You will be given dictionary with vertex and edge descriptions within a single graph. Your job is to provide short summary of that graph that captures all of the distinct information from each description. Purpose of summarization is for graph to have a single concise description.
 
 Here are the descriptions: {descriptions}
-"""
\ No newline at end of file
+"""
+
+SUMMARIZE_PARTIAL_SUMMARIES_PROMPT = """
+You will be given list of summaries, each one describes a different part of a single graph. Your job is to combine them into short summary of the whole graph that captures all of the distinct information from each summary. Purpose of summarization is for graph to have a single concise description.
+
+Here are the summaries: {summaries}
+"""
+
+DIALOGUE_TURN_PROMPT = """
+You are writing a conversation between a curious user and an assistant who knows the document well. The conversation walks through a knowledge graph extracted from the document, one entity at a time. Write the next exchange of that conversation: one question of the user and the answer of the assistant. Use only the information given below and do not mention the graph.
+
+{transition}
+
+Previous entity: {previous}
+Current entity: {current}
+Relationship between them: {relationship}
+"""
+
+DIALOGUE_TRANSITIONS = {
+    "start": "This is the beginning of the conversation. The user opens it with a question about the current entity.",
+    "forward": "The user follows up on the previous entity with a question about the current entity, which is related to it.",
+    "return": "The conversation comes back to the previous entity, which was discussed earlier, and the user moves on from it to the current entity.",
+    "community_switch": "The conversation moves on to a different topic of the document. The user changes the subject towards the current entity.",
+    "group_switch": "The conversation switches to a part of the document that is not connected to what was discussed so far. The user starts a new line of questions about the current entity.",
+}
@@ -32,4 +32,18 @@ class EntityRelationshipResponse(BaseModel):
 
 
 class SummarizedDescription(BaseModel):
-    description: str
\ No newline at end of file
+    description: str
+
+
+class ItemSummary(BaseModel):
+    id: int
+    description: str
+
+
+class SummarizedDescriptions(BaseModel):
+    summaries: list[ItemSummary]
+
+
+class DialogueTurn(BaseModel):
+    question: str
+    answer: str
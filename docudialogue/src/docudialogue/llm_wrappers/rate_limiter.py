@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Mapping
+
+from openai import APIConnectionError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+# Rate limiter of the stage that is currently making LLM calls. It is set by
+# AdaptiveRateLimiter.run so that models can report token usage and response
+# headers without the limiter being threaded through every call.
+current_rate_limiter: ContextVar["AdaptiveRateLimiter | None"] = ContextVar(
+    "current_rate_limiter", default=None
+)
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parse durations used in rate limit headers, e.g. "1s", "6m0s", "20ms" or "0.5"."""
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, matched = 0.0, False
+    for amount, unit in re.findall(r"([\d.]+)(ms|s|m|h)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+def _get_status_code(error: BaseException) -> int | None:
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+    return status_code
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return _get_status_code(error) == 429
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Timeouts, connection problems, rate limits and server errors are worth retrying."""
+    if isinstance(error, (TimeoutError, ConnectionError, APIConnectionError)):
+        return True
+    status_code = _get_status_code(error)
+    return status_code is not None and (status_code in (408, 409, 429) or status_code >= 500)
+
+
+def get_retry_after(error: BaseException) -> float | None:
+    """Read retry-after-ms / retry-after headers from an API error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        return float(retry_after_ms) / 1000
+    return parse_duration(headers.get("retry-after"))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity_per_minute / 60 per second.
+    Requests larger than the whole capacity are clipped to the capacity so that
+    they can still go through once the bucket is full.
+    """
+
+    def __init__(self, capacity_per_minute: float) -> None:
+        self.capacity = float(capacity_per_minute)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / 60
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.refill_rate
+        )
+        self._updated_at = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.refill_rate)
+
+    def update(self, limit: float | None, remaining: float | None) -> None:
+        """Synchronize the bucket with limits reported by the API."""
+        self._refill()
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self._tokens = min(self._tokens, float(remaining))
+
+
+class AdaptiveRateLimiter:
+    """
+    Scheduler for concurrent LLM calls of one pipeline stage:
+    - token buckets bound requests per minute and tokens per minute,
+    - buckets are synchronized with x-ratelimit-* response headers when present,
+    - allowed concurrency grows additively on success and shrinks
+      multiplicatively on rate limit errors (AIMD).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        increase_step: float = 1.0,
+        decrease_factor: float = 0.5,
+        max_rate_limit_retries: int = 5,
+    ) -> None:
+        self.request_bucket = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(
+            min(max(initial_concurrency, min_concurrency), max_concurrency)
+        )
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.num_successes = 0
+        self.num_rate_limited = 0
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease_at = 0.0
+        self._condition = asyncio.Condition()
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "AdaptiveRateLimiter | None":
+        if not config:
+            return None
+        return cls(
+            requests_per_minute=config.get("requests_per_minute"),
+            tokens_per_minute=config.get("tokens_per_minute"),
+            initial_concurrency=config.get("initial_concurrency", 8),
+            min_concurrency=config.get("min_concurrency", 1),
+            max_concurrency=config.get("max_concurrency", 64),
+            increase_step=config.get("increase_step", 1.0),
+            decrease_factor=config.get("decrease_factor", 0.5),
+            max_rate_limit_retries=config.get("max_rate_limit_retries", 5),
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait until the current concurrency limit allows another call."""
+        async with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), pause)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self._in_flight < int(self.concurrency):
+                    break
+                await self._condition.wait()
+            self._in_flight += 1
+        try:
+            if self.request_bucket is not None:
+                await self.request_bucket.acquire(1)
+            yield
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    async def acquire_tokens(self, num_tokens: int) -> None:
+        if self.token_bucket is not None:
+            await self.token_bucket.acquire(num_tokens)
+
+    def update_from_headers(self, headers: Mapping[str, Any]) -> None:
+        """Synchronize buckets with OpenAI style x-ratelimit-* headers."""
+        for bucket, suffix in (
+            (self.request_bucket, "requests"),
+            (self.token_bucket, "tokens"),
+        ):
+            limit = headers.get(f"x-ratelimit-limit-{suffix}")
+            if limit is None:
+                continue
+            remaining = headers.get(f"x-ratelimit-remaining-{suffix}")
+            if bucket is None:
+                bucket = TokenBucket(float(limit))
+                if suffix == "requests":
+                    self.request_bucket = bucket
+                else:
+                    self.token_bucket = bucket
+            bucket.update(
+                float(limit), float(remaining) if remaining is not None else None
+            )
+
+    def on_success(self) -> None:
+        self.num_successes += 1
+        # Additive increase: a full window of successful calls adds increase_step
+        self.concurrency = min(
+            self.max_concurrency,
+            self.concurrency + self.increase_step / max(self.concurrency, 1),
+        )
+
+    def on_rate_limited(self, retry_after: float | None = None) -> None:
+        self.num_rate_limited += 1
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + (retry_after or 1.0))
+        # Calls that were already in flight fail together, so decrease
+        # only once per burst of rate limit errors.
+        if now - self._last_decrease_at > (retry_after or 1.0):
+            self._last_decrease_at = now
+            self.concurrency = max(
+                self.min_concurrency, self.concurrency * self.decrease_factor
+            )
+            logger.info(
+                f"Rate limited, lowering concurrency to {int(self.concurrency)}"
+            )
+
+    async def run(self, func):
+        """Run a single async call under this limiter and record its outcome."""
+        async with self.slot():
+            token = current_rate_limiter.set(self)
+            try:
+                result = await func()
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    self.on_rate_limited(get_retry_after(e))
+                raise
+            finally:
+                current_rate_limiter.reset(token)
+        self.on_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": int(self.concurrency),
+            "successes": self.num_successes,
+            "rate_limited": self.num_rate_limited,
+        }
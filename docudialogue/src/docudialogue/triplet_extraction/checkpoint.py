@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Iterator
+
+from docudialogue.triplet_extraction.classes import Triplet
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class TripletCheckpoint:
+    """
+    Append-only JSONL checkpoint of extracted triplets.
+    Each line holds the triplets of one chunk together with the hash of the
+    chunk content, so an interrupted extraction can be resumed by skipping
+    chunks whose hash is already in the file.
+    Each record is written to the file right away, but the file is synced to
+    disk at most once every sync_interval seconds and on close. Chunks lost
+    in a crash are extracted again on resume.
+    """
+
+    def __init__(self, path: str, sync_interval: float = 1.0) -> None:
+        folder_path = os.path.dirname(path)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        self._path = path
+        self._sync_interval = sync_interval
+        self._last_sync = time.monotonic()
+        # Number of triplets found in each completed chunk
+        self._completed: dict[str, int] = {}
+        self._load()
+        self._file = None
+
+    @staticmethod
+    def hash_chunk(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _iter_records(self) -> Iterator[dict]:
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, "r", encoding="utf-8") as f:
+            for line_idx, line in enumerate(f):
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line can be incomplete if the process crashed while writing it
+                    logger.warning(f"Skipping corrupted checkpoint line {line_idx}")
+
+    def _load(self) -> None:
+        for record in self._iter_records():
+            self._completed[record["chunk_hash"]] = len(record["triplets"])
+        if self._completed:
+            logger.info(f"Loaded checkpoint with {len(self._completed)} completed chunks")
+        # Make sure a new record does not continue a partially written line
+        if os.path.exists(self._path) and os.path.getsize(self._path) > 0:
+            with open(self._path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                ends_with_newline = f.read(1) == b"\n"
+            if not ends_with_newline:
+                with open(self._path, "a", encoding="utf-8") as f:
+                    f.write("\n")
+
+    @staticmethod
+    def _is_selected(chunk_hash: str, chunk_hashes: set[str] | None) -> bool:
+        return chunk_hashes is None or chunk_hash in chunk_hashes
+
+    def is_completed(self, chunk_hash: str) -> bool:
+        return chunk_hash in self._completed
+
+    def num_triplets(self, chunk_hashes: set[str] | None = None) -> int:
+        return sum(
+            num
+            for chunk_hash, num in self._completed.items()
+            if self._is_selected(chunk_hash, chunk_hashes)
+        )
+
+    def write(
+        self, chunk_hash: str, doc_idx: int, chunk_idx: int, triplets: list[Triplet]
+    ) -> None:
+        record = {
+            "chunk_hash": chunk_hash,
+            "document": doc_idx,
+            "chunk": chunk_idx,
+            "triplets": [triplet.to_dict() for triplet in triplets],
+        }
+        if self._file is None:
+            self._file = open(self._path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.flush()
+        self._completed[chunk_hash] = len(triplets)
+
+    def flush(self, sync: bool = False) -> None:
+        """Writes buffered records, and syncs them if sync_interval has passed or sync is set."""
+        if self._file is None:
+            return
+        self._file.flush()
+        if sync or time.monotonic() - self._last_sync >= self._sync_interval:
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+
+    def iter_triplets(self, chunk_hashes: set[str] | None = None) -> Iterator[Triplet]:
+        """
+        Stream triplets from the checkpoint without loading the whole file.
+        If chunk_hashes is given, only triplets of those chunks are returned.
+        """
+        seen = set()
+        for record in self._iter_records():
+            chunk_hash = record["chunk_hash"]
+            if chunk_hash in seen or not self._is_selected(chunk_hash, chunk_hashes):
+                continue
+            seen.add(chunk_hash)
+            for triplet in record["triplets"]:
+                yield Triplet.from_dict(triplet)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush(sync=True)
+            self._file.close()
+            self._file = None
+
@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 import logging
 
 from docudialogue.triplet_extraction.classes import Entity
-from docudialogue.llm_wrappers.llm_wrappers import OpenAIModel
+from docudialogue.llm_wrappers.llm_wrappers import LLMModel, OpenAIModel
 from docudialogue.llm_wrappers.prompts import (
     ENTITY_GENERATION_PROMPT,
     ENTITY_TYPE_GENERATION_PROMPT,
@@ -35,8 +35,10 @@ class EntityExtractor(ABC):
 
 
 class LLMEntityExtractor(EntityExtractor):
-    def __init__(self, entity_types: list[str] | None = None) -> None:
-        self._model = OpenAIModel(os.environ["LLM_API_KEY"])
+    def __init__(
+        self, entity_types: list[str] | None = None, model: LLMModel | None = None
+    ) -> None:
+        self._model = model or OpenAIModel(os.environ["LLM_API_KEY"])
         self._entity_types = entity_types
         logger.info("LLM Entity Extractor initialized!")
 
@@ -3,7 +3,7 @@ import logging
 import os
 
 from docudialogue.triplet_extraction.classes import Entity, Relationship, Triplet
-from docudialogue.llm_wrappers.llm_wrappers import OpenAIModel
+from docudialogue.llm_wrappers.llm_wrappers import LLMModel, OpenAIModel
 from docudialogue.llm_wrappers.prompts import RELATIONSHIPS_GENERATION_PROMPT
 from docudialogue.llm_wrappers.pydantic_classes import RelationshipResponse
 
@@ -22,8 +22,8 @@ class RelationshipExtractor(ABC):
 
 
 class LLMRelationshipExtractor(RelationshipExtractor):
-    def __init__(self) -> None:
-        self._model = OpenAIModel(os.environ["LLM_API_KEY"])
+    def __init__(self, model: LLMModel | None = None) -> None:
+        self._model = model or OpenAIModel(os.environ["LLM_API_KEY"])
         logger.info("LLM Relationship Extractor initialized!")
 
     async def extract(self, text: str, entities: list[Entity]) -> list[Triplet]:
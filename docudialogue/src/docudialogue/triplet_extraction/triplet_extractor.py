@@ -1,14 +1,27 @@
 from abc import ABC, abstractmethod
 import logging
 import os
+from typing import AsyncIterator, Awaitable, Callable
 
-from docudialogue.src.docudialogue.utils import run_concurrent
+from docudialogue.utils import (
+    BatchResult,
+    RetryPolicy,
+    run_concurrent,
+    run_concurrent_stream,
+)
+from docudialogue.triplet_extraction.checkpoint import TripletCheckpoint
 from docudialogue.triplet_extraction.classes import Entity, Relationship, Triplet
 from docudialogue.triplet_extraction.entity_extractor import (
     LLMEntityExtractor,
     TransformerEntityExtractor,
 )
-from docudialogue.llm_wrappers.llm_wrappers import OpenAIModel
+from docudialogue.llm_wrappers.llm_cache import LLMResponseCache
+from docudialogue.llm_wrappers.llm_wrappers import (
+    LLMModel,
+    OpenAIModel,
+    create_llm_model,
+)
+from docudialogue.llm_wrappers.rate_limiter import AdaptiveRateLimiter
 from docudialogue.llm_wrappers.prompts import (
     ENTITY_TYPE_GENERATION_PROMPT,
     ENTITY_RELATIONSHIPS_GENERATION_PROMPT,
@@ -22,8 +35,10 @@ logger.setLevel(logging.INFO)
 
 
 class TripletExtractionPipeline:
-    def __init__(self, config: dict) -> None:
-        self._model = OpenAIModel(os.environ["LLM_API_KEY"])
+    def __init__(self, config: dict, cache: LLMResponseCache | None = None) -> None:
+        self._model = create_llm_model(config.get("llm"), cache=cache)
+        self._rate_limiter = AdaptiveRateLimiter.from_config(config.get("rate_limit"))
+        self._retry_policy = RetryPolicy.from_config(config.get("retry"))
         self._entity_types = config["entity_types"]
         if config["extractor_type"] == "combined":
             self.extractor = CombinedTripletExtractor(self._model)
@@ -36,7 +51,7 @@ class TripletExtractionPipeline:
         if not self._entity_types:
             logger.info("Entity types not found! Quering LLM to find it...")
             input_text = " ".join([d for doc in docs for d in doc])
-            respone = await self._model.parse(
+            detect = lambda: self._model.parse(
                 system_prompt="",
                 user_prompt=ENTITY_TYPE_GENERATION_PROMPT.format(
                     input_text=input_text
@@ -45,33 +60,275 @@ class TripletExtractionPipeline:
                 model_name="gpt-4o-mini",
                 temperature=0,
             )
+            respone = (
+                await self._rate_limiter.run(detect)
+                if self._rate_limiter is not None
+                else await detect()
+            )
             self._entity_types = respone.types
             logger.info(f"Following entity types found: {self._entity_types}")
         return self._entity_types
 
+    async def run_per_document(self, docs: list[list[str]]) -> list[list[Triplet]]:
+        """
+        Extract triplets from all chunks of all documents through one shared work
+        queue, so small documents fill the slots left idle by large ones.
+        Returns one list of triplets per document, in input order.
+        """
+        await self._detect_entity_types(docs)
+        triplets_per_doc = await self.extractor.extract_documents(
+            docs,
+            self._entity_types,
+            rate_limiter=self._rate_limiter,
+            retry_policy=self._retry_policy,
+        )
+        self._log_extraction_stats()
+        for doc_idx, doc_triplets in enumerate(triplets_per_doc):
+            logger.info(f"Found {len(doc_triplets)} triplets in document {doc_idx}.")
+        return triplets_per_doc
+
     async def run(self, docs: list[list[str]]) -> list[Triplet]:
-        triplets = []
+        triplets_per_doc = await self.run_per_document(docs)
+        return [triplet for doc_triplets in triplets_per_doc for triplet in doc_triplets]
+
+    async def run_to_checkpoint(
+        self, docs: list[list[str]], checkpoint: TripletCheckpoint
+    ) -> None:
+        """
+        Extract triplets and append each chunk's triplets to the checkpoint as soon
+        as its LLM call completes. Chunks already present in the checkpoint are skipped.
+        """
+        num_chunks = sum(len(doc) for doc in docs)
+        num_pending = sum(
+            not checkpoint.is_completed(TripletCheckpoint.hash_chunk(chunk))
+            for doc in docs
+            for chunk in doc
+        )
+        logger.info(
+            f"{num_chunks - num_pending} chunks found in checkpoint, "
+            f"{num_pending} chunks left to extract."
+        )
+        if num_pending == 0:
+            return
         await self._detect_entity_types(docs)
-        for doc in docs:
-            curr_triplets = await self.extractor.extract(doc, self._entity_types)
-            logger.info(f"Found {len(curr_triplets)} triplets in document.")
-            triplets.extend(curr_triplets)
-        return triplets
+        await self.extractor.extract_to_checkpoint(
+            docs,
+            self._entity_types,
+            checkpoint,
+            rate_limiter=self._rate_limiter,
+            retry_policy=self._retry_policy,
+        )
+        self._log_extraction_stats()
+
+    async def run_stream(
+        self,
+        docs: AsyncIterator[tuple[int, list[str]]],
+        checkpoint: TripletCheckpoint,
+        on_triplets: Callable[[list[Triplet]], Awaitable],
+    ) -> set[str]:
+        """
+        Extract triplets from (document index, chunks) items while they are still
+        being produced. Triplets of each chunk are written to the checkpoint and
+        passed to on_triplets as soon as the chunk is done.
+        If entity types are not configured, they are detected from the first document.
+        Returns hashes of chunks that were skipped because they were already in the
+        checkpoint, so their triplets can be read from it.
+        """
+        docs = aiter(docs)
+        first_doc = await anext(docs, None)
+        if first_doc is None:
+            return set()
+        await self._detect_entity_types([first_doc[1]])
+        skipped_hashes = set()
+
+        async def chunks():
+            yield_doc = first_doc
+            while yield_doc is not None:
+                doc_idx, doc = yield_doc
+                for chunk_idx, text in enumerate(doc):
+                    chunk_hash = TripletCheckpoint.hash_chunk(text)
+                    if checkpoint.is_completed(chunk_hash):
+                        skipped_hashes.add(chunk_hash)
+                    else:
+                        yield doc_idx, chunk_idx, text
+                yield_doc = await anext(docs, None)
+
+        async def on_chunk_extracted(
+            doc_idx: int, chunk_idx: int, text: str, triplets: list[Triplet]
+        ):
+            checkpoint.write(TripletCheckpoint.hash_chunk(text), doc_idx, chunk_idx, triplets)
+            await on_triplets(triplets)
+
+        await self.extractor.extract_stream(
+            chunks(),
+            self._entity_types,
+            on_chunk_extracted,
+            rate_limiter=self._rate_limiter,
+            retry_policy=self._retry_policy,
+        )
+        self._log_extraction_stats()
+        return skipped_hashes
+
+    def _log_extraction_stats(self) -> None:
+        if self.extractor.failed_chunks:
+            logger.warning(
+                f"{len(self.extractor.failed_chunks)} chunks failed and were skipped: "
+                f"{[(doc_idx, chunk_idx) for doc_idx, chunk_idx, _ in self.extractor.failed_chunks]}"
+            )
+        if self._rate_limiter is not None:
+            logger.info(f"Extraction rate limiter stats: {self._rate_limiter.stats()}")
 
 
 class AbstractTripletExtractor(ABC):
     def __init__(self) -> None:
         super().__init__()
 
+    # (document index, chunk index, error) of chunks that failed in the last extraction
+    failed_chunks: list[tuple[int, int, BaseException]] = []
+
     @abstractmethod
     async def _extract_from_text(self, text: str, entity_types: list[str]) -> list[Triplet]:
         raise NotImplementedError
 
     async def extract(self, texts: list[str], entity_types: list[str]) -> list[Triplet]:
-        async_funcs = [lambda t=text: self._extract_from_text(t, entity_types) for text in texts]
-        results = await run_concurrent(async_funcs)
-        triplets = [triplet for sublist in results for triplet in sublist]
-        return self.postprocess_triplets(triplets)
+        return (await self.extract_documents([texts], entity_types))[0]
+
+    async def extract_documents(
+        self,
+        docs: list[list[str]],
+        entity_types: list[str],
+        rate_limiter: AdaptiveRateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+    ) -> list[list[Triplet]]:
+        """
+        Flatten chunks of all documents into a single bounded work queue and
+        group the results back by document. Chunks that fail after all retries
+        are skipped and stored in failed_chunks, results of other chunks are kept.
+        """
+        chunk_ids, batch_result = await self._extract_chunks(
+            docs, entity_types, rate_limiter, retry_policy
+        )
+        triplets_per_doc = [[] for _ in docs]
+        for idx, chunk_triplets in batch_result.successes.items():
+            triplets_per_doc[chunk_ids[idx][0]].extend(chunk_triplets)
+        return [self.postprocess_triplets(triplets) for triplets in triplets_per_doc]
+
+    async def extract_to_checkpoint(
+        self,
+        docs: list[list[str]],
+        entity_types: list[str],
+        checkpoint: TripletCheckpoint,
+        rate_limiter: AdaptiveRateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        """
+        Same as extract_documents, but triplets of each chunk are written to the
+        checkpoint when the chunk is done instead of being kept in memory.
+        Chunks already present in the checkpoint are skipped.
+        """
+
+        async def on_chunk_extracted(
+            doc_idx: int, chunk_idx: int, text: str, triplets: list[Triplet]
+        ):
+            checkpoint.write(
+                TripletCheckpoint.hash_chunk(text),
+                doc_idx,
+                chunk_idx,
+                self.postprocess_triplets(triplets),
+            )
+
+        await self._extract_chunks(
+            docs,
+            entity_types,
+            rate_limiter,
+            retry_policy,
+            on_chunk_extracted,
+            skip_chunk=lambda text: checkpoint.is_completed(
+                TripletCheckpoint.hash_chunk(text)
+            ),
+        )
+
+    async def _extract_chunks(
+        self,
+        docs: list[list[str]],
+        entity_types: list[str],
+        rate_limiter: AdaptiveRateLimiter | None,
+        retry_policy: RetryPolicy | None,
+        on_chunk_extracted=None,
+        skip_chunk=None,
+    ) -> tuple[list[tuple[int, int]], BatchResult]:
+        """
+        Run extraction for every chunk of every document through run_concurrent.
+        If on_chunk_extracted is given, it consumes each chunk's triplets and
+        nothing is stored in the returned BatchResult.
+        Chunks for which skip_chunk returns True are not extracted.
+        """
+        chunk_ids = [
+            (doc_idx, chunk_idx)
+            for doc_idx, doc in enumerate(docs)
+            for chunk_idx, text in enumerate(doc)
+            if skip_chunk is None or not skip_chunk(text)
+        ]
+
+        async def extract_chunk(doc_idx: int, chunk_idx: int, text: str):
+            triplets = await self._extract_from_text(text, entity_types)
+            if on_chunk_extracted is None:
+                return triplets
+            await on_chunk_extracted(doc_idx, chunk_idx, text, triplets)
+
+        async_funcs = [
+            lambda d=doc_idx, c=chunk_idx: extract_chunk(d, c, docs[d][c])
+            for doc_idx, chunk_idx in chunk_ids
+        ]
+        batch_result = await run_concurrent(
+            async_funcs, rate_limiter=rate_limiter, retry_policy=retry_policy
+        )
+        self.failed_chunks = [
+            (*chunk_ids[idx], error) for idx, error in batch_result.errors.items()
+        ]
+        return chunk_ids, batch_result
+
+    async def extract_stream(
+        self,
+        chunks: AsyncIterator[tuple[int, int, str]],
+        entity_types: list[str],
+        on_chunk_extracted: Callable[[int, int, str, list[Triplet]], Awaitable],
+        rate_limiter: AdaptiveRateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        """
+        Extract triplets from (document index, chunk index, text) items as they
+        arrive and hand each chunk's postprocessed triplets to on_chunk_extracted.
+        Chunks are only pulled from the iterator when a worker is free.
+        """
+        failed_chunks = []
+        # Texts of chunks that are in flight, needed by on_chunk_extracted
+        texts: dict[tuple[int, int], str] = {}
+
+        async def keyed_funcs():
+            async for doc_idx, chunk_idx, text in chunks:
+                texts[(doc_idx, chunk_idx)] = text
+                yield (doc_idx, chunk_idx), lambda t=text: self._extract_from_text(
+                    t, entity_types
+                )
+
+        async def on_result(key: tuple[int, int], triplets: list[Triplet]):
+            await on_chunk_extracted(
+                *key, texts.pop(key), self.postprocess_triplets(triplets)
+            )
+
+        async def on_error(key: tuple[int, int], error: BaseException):
+            texts.pop(key)
+            failed_chunks.append((*key, error))
+
+        await run_concurrent_stream(
+            keyed_funcs(),
+            on_result,
+            on_error,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+        )
+        self.failed_chunks = failed_chunks
 
     def postprocess_triplets(self, triplets: list[Triplet]) -> list[Triplet]:
         # Remove duplicates
@@ -80,8 +337,10 @@ class AbstractTripletExtractor(ABC):
 
 
 class CombinedTripletExtractor(AbstractTripletExtractor):
-    def __init__(self, entity_types: list[str] | None = None) -> None:
-        self._model = OpenAIModel(os.environ["LLM_API_KEY"])
+    def __init__(
+        self, model: LLMModel | None = None, entity_types: list[str] | None = None
+    ) -> None:
+        self._model = model or OpenAIModel(os.environ["LLM_API_KEY"])
         self._entity_types = entity_types
         logger.info("Combined Triplet Extractor initialized!")
 
@@ -118,14 +377,17 @@ class CombinedTripletExtractor(AbstractTripletExtractor):
 
 class SeparateTripletExtractor(AbstractTripletExtractor):
     def __init__(
-        self, entity_extractor_type: str, entity_types: list[str] | None = None
+        self,
+        model: LLMModel | None,
+        entity_extractor_type: str,
+        entity_types: list[str] | None = None,
     ) -> None:
         self._entity_extractor = (
-            LLMEntityExtractor(entity_types=entity_types)
+            LLMEntityExtractor(entity_types=entity_types, model=model)
             if entity_extractor_type == "llm"
             else TransformerEntityExtractor()
         )
-        self._relationship_extractor = LLMRelationshipExtractor()
+        self._relationship_extractor = LLMRelationshipExtractor(model=model)
         logger.info("Separate Triplet Extractor initialized!")
 
     async def _extract_from_text(self, text: str, entity_types: list[str]) -> list[Triplet]:
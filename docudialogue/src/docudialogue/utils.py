@@ -1,6 +1,17 @@
 import pickle
 import asyncio
-from asyncio import Semaphore
+import logging
+import random
+from typing import AsyncIterator, Awaitable, Callable, Hashable
+
+from docudialogue.llm_wrappers.rate_limiter import (
+    AdaptiveRateLimiter,
+    is_rate_limit_error,
+    is_retryable_error,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 # Save the entire pickle object
 def save_pickle(pickle_object, filename):
@@ -12,11 +23,197 @@ def load_pickle(filename):
     with open(filename, 'rb') as f:
         return pickle.load(f)
 
-async def run_concurrent(funcs, max_concurrent=20):
-    semaphore = Semaphore(max_concurrent)
 
-    async def sem_task(f):
-        async with semaphore:
+class RetryPolicy:
+    """
+    Per-call timeout and bounded retries with exponential backoff and full jitter.
+    Only errors accepted by is_retryable_error are retried.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        timeout: float | None = 120.0,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_config(cls, config: dict | None) -> "RetryPolicy":
+        config = config or {}
+        return cls(
+            max_attempts=config.get("max_attempts", 3),
+            timeout=config.get("timeout_seconds", 120.0),
+            base_delay=config.get("base_delay", 1.0),
+            max_delay=config.get("max_delay", 30.0),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class BatchResult:
+    """
+    Results of run_concurrent. Successful results are kept even when other calls
+    of the same batch failed.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.results = [None] * size
+        self.errors: dict[int, BaseException] = {}
+
+    @property
+    def successes(self) -> dict[int, object]:
+        return {
+            idx: result
+            for idx, result in enumerate(self.results)
+            if idx not in self.errors
+        }
+
+    @property
+    def failed_ids(self) -> list[int]:
+        return sorted(self.errors)
+
+
+async def run_concurrent(
+    funcs,
+    max_concurrent=20,
+    rate_limiter: AdaptiveRateLimiter | None = None,
+    retry_policy: RetryPolicy | None = None,
+) -> BatchResult:
+    """
+    Run async functions through a bounded work queue with max_concurrent workers.
+    Only max_concurrent calls are in flight at any time and results are stored
+    in the same order as funcs.
+    If rate_limiter is given, it decides how many of the workers may call the LLM
+    at once and calls that were rate limited are put back into the queue.
+    If retry_policy is given, each call is bounded by its timeout and calls that
+    failed with a retryable error are put back into the queue after a backoff.
+    Calls that still fail are recorded in BatchResult.errors instead of aborting
+    the whole batch.
+    """
+    funcs = list(funcs)
+    batch_result = BatchResult(len(funcs))
+
+    async def indexed_funcs():
+        for idx, f in enumerate(funcs):
+            yield idx, f
+
+    async def on_result(idx, result):
+        batch_result.results[idx] = result
+
+    async def on_error(idx, error):
+        batch_result.errors[idx] = error
+
+    await run_concurrent_stream(
+        indexed_funcs(),
+        on_result,
+        on_error,
+        max_concurrent=max_concurrent,
+        rate_limiter=rate_limiter,
+        retry_policy=retry_policy,
+    )
+    return batch_result
+
+
+async def run_concurrent_stream(
+    keyed_funcs: AsyncIterator[tuple[Hashable, Callable[[], Awaitable]]],
+    on_result: Callable[[Hashable, object], Awaitable],
+    on_error: Callable[[Hashable, BaseException], Awaitable],
+    max_concurrent=20,
+    rate_limiter: AdaptiveRateLimiter | None = None,
+    retry_policy: RetryPolicy | None = None,
+) -> None:
+    """
+    Streaming version of run_concurrent. (key, func) pairs are pulled from an
+    async iterator only when a worker can take them, so at most max_concurrent
+    calls are pending at once, including calls waiting for a retry. Each result
+    or final error is handed to on_result / on_error together with its key.
+    If rate_limiter is given, its max_concurrency caps max_concurrent further.
+    """
+    retry_policy = retry_policy or RetryPolicy(max_attempts=1, timeout=None)
+    if rate_limiter is not None:
+        max_concurrent = min(max_concurrent, rate_limiter.max_concurrency)
+
+    queue = asyncio.Queue()
+    capacity = asyncio.Semaphore(max_concurrent)
+    num_unresolved = 0
+    source_exhausted = False
+    all_resolved = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    async def feed():
+        nonlocal num_unresolved, source_exhausted
+        async for key, f in keyed_funcs:
+            await capacity.acquire()
+            num_unresolved += 1
+            queue.put_nowait((key, f, 0, 0))
+        source_exhausted = True
+        if num_unresolved == 0:
+            all_resolved.set()
+
+    def resolve():
+        nonlocal num_unresolved
+        num_unresolved -= 1
+        capacity.release()
+        if source_exhausted and num_unresolved == 0:
+            all_resolved.set()
+
+    async def call(f):
+        if retry_policy.timeout is None:
             return await f()
+        return await asyncio.wait_for(f(), retry_policy.timeout)
+
+    async def worker():
+        while True:
+            key, f, attempt, num_rate_limited = await queue.get()
+            try:
+                if rate_limiter is None:
+                    result = await call(f)
+                else:
+                    result = await rate_limiter.run(lambda: call(f))
+            except Exception as e:
+                if (
+                    rate_limiter is not None
+                    and is_rate_limit_error(e)
+                    and num_rate_limited < rate_limiter.max_rate_limit_retries
+                ):
+                    # Rate limiter already paused the stage, no extra backoff needed
+                    queue.put_nowait((key, f, attempt, num_rate_limited + 1))
+                elif is_retryable_error(e) and attempt + 1 < retry_policy.max_attempts:
+                    delay = retry_policy.backoff(attempt)
+                    logger.info(f"Call {key} failed ({e!r}), retrying in {delay:.1f}s")
+                    loop.call_later(
+                        delay,
+                        queue.put_nowait,
+                        (key, f, attempt + 1, num_rate_limited),
+                    )
+                else:
+                    logger.warning(f"Call {key} failed after {attempt + 1} attempts: {e!r}")
+                    await on_error(key, e)
+                    resolve()
+            else:
+                await on_result(key, result)
+                resolve()
 
-    return await asyncio.gather(*(sem_task(f) for f in funcs))
+    feeder = asyncio.create_task(feed())
+    resolved = asyncio.create_task(all_resolved.wait())
+    workers = [asyncio.create_task(worker()) for _ in range(max_concurrent)]
+    pending = {feeder, resolved, *workers}
+    try:
+        # Errors of the source iterator or of the callbacks are raised here
+        while not resolved.done():
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task is not resolved and task.exception() is not None:
+                    raise task.exception()
+    finally:
+        for task in [feeder, resolved, *workers]:
+            task.cancel()
+        await asyncio.gather(feeder, resolved, *workers, return_exceptions=True)